@@ -1,43 +1,245 @@
 #!/usr/bin/env python3
 import argparse
+import sys
 
-from itbrowz.itbrowz import (
-    arbitrary_url_lookup,
-    class_lookup,
-    race_lookup,
-    spell_lookup,
+from itbrowz import instrument
+from itbrowz.client import DEFAULT_SOCKET_PATH, run_client
+from itbrowz.constants import (
+    DEFAULT_JOBS,
+    DEFAULT_MIRROR_PATH,
+    DEFAULT_WORKERS,
+    FAMILIES,
 )
+from itbrowz.targets import Target, read_targets
+
+
+# Every --spell/--class/--race/--url is queued in command line order, while
+# the option's own dest keeps the last value for single-lookup callers
+class TargetAction(argparse.Action):
+    def __call__(self, parser, namespace, values, option_string=None):
+        kind = "class" if self.dest == "_class" else self.dest
+        if kind == "race":
+            values = values.replace("_", "-")
+        setattr(namespace, self.dest, values)
+        namespace.targets = namespace.targets + [Target(kind, values)]
+
+
+# Colors only go to a terminal unless asked for. Files written through
+# --output-dir are never a terminal, wherever stdout happens to point.
+def use_color(args, stdout):
+    if args.no_color:
+        return False
+    if args.color:
+        return True
+    return not args.output_dir and stdout.isatty()
 
 
 def main():
     parser = argparse.ArgumentParser(description="DND Quick lookup")
+    parser.set_defaults(targets=[])
+    parser.add_argument(
+        "-s", "--spell", action=TargetAction, dest="spell", default="", help="Spell"
+    )
+    parser.add_argument(
+        "-c", "--class", action=TargetAction, dest="_class", default="", help="Class"
+    )
+    parser.add_argument(
+        "-r", "--race", action=TargetAction, dest="race", default="", help="Race"
+    )
+    parser.add_argument(
+        "-u", "--url", action=TargetAction, dest="url", default="", help="Arbitrary URL"
+    )
+    parser.add_argument(
+        "-t",
+        "--targets",
+        type=str,
+        dest="targets_file",
+        default="",
+        help="File with one '<spell|class|race|url> <name>' or URL per line",
+    )
     parser.add_argument(
-        "-s", "--spell", type=str, dest="spell", default="", help="Spell"
+        "-j",
+        "--jobs",
+        type=int,
+        dest="jobs",
+        default=DEFAULT_JOBS,
+        help="Number of targets to fetch and parse at once",
     )
     parser.add_argument(
-        "-c", "--class", type=str, dest="_class", default="", help="Class"
+        "-o",
+        "--output-dir",
+        type=str,
+        dest="output_dir",
+        default="",
+        help="Write each target to its own file in this directory",
     )
-    parser.add_argument("-r", "--race", type=str, dest="race", default="", help="Race")
     parser.add_argument(
-        "-u", "--url", type=str, dest="url", default="", help="Arbitrary URL"
+        "-S",
+        "--search",
+        type=str,
+        dest="search",
+        default="",
+        help="Search mirrored spells, classes and races",
     )
     parser.add_argument(
         "-d", "--div", type=str, dest="div", default="", help="Div identifier"
     )
+    parser.add_argument(
+        "--no-color",
+        action="store_true",
+        dest="no_color",
+        help="Disable colored output (implied when output is not a terminal)",
+    )
+    parser.add_argument(
+        "--color",
+        action="store_true",
+        dest="color",
+        help="Color output even when it is not a terminal",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        dest="offline",
+        help="Only serve pages from the local cache",
+    )
+    parser.add_argument(
+        "--mirror",
+        type=str,
+        dest="mirror",
+        default=DEFAULT_MIRROR_PATH,
+        help="Local mirror of 5thsrd pages, used when present",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        dest="timings",
+        help="Report time per phase, bytes fetched and memory use on stderr",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        dest="profile",
+        default="",
+        help="Write cProfile stats for the whole run to this file",
+    )
+    parser.add_argument(
+        "--images",
+        action="store_true",
+        dest="images",
+        help="Show images inline with the iTerm2 image protocol",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        dest="stream",
+        help="Print each part of a page as soon as it has downloaded",
+    )
+    parser.add_argument(
+        "-p",
+        "--pager",
+        action="store_true",
+        dest="pager",
+        help="Browse the first target interactively instead of printing it",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        dest="prefetch",
+        default=0,
+        help="In the pager, load this many of each page's links in the background",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        dest="serve",
+        help="Keep pages and connections warm in a daemon listening on --socket",
+    )
+    parser.add_argument(
+        "--client",
+        action="store_true",
+        dest="client",
+        help="Have the --serve daemon do the lookups and print its output",
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        dest="socket",
+        default=DEFAULT_SOCKET_PATH,
+        help="Unix socket used by --serve and --client",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    mirror_parser = subparsers.add_parser(
+        "mirror", help="Download 5thsrd spells, classes and races for offline use"
+    )
+    mirror_parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        dest="workers",
+        default=DEFAULT_WORKERS,
+        help="Number of pages to fetch at once",
+    )
+    mirror_parser.add_argument(
+        "-f",
+        "--family",
+        action="append",
+        dest="families",
+        choices=list(FAMILIES),
+        help="Only mirror this kind of page (repeatable)",
+    )
     args = parser.parse_args()
-    for k, v in vars(args).items():
-        vars(args)[k] = v.replace("-", "_") if k == "spell" else v
-        vars(args)[k] = v.replace("_", "-") if k == "race" else v
-    if args.spell:
-        spell_lookup(args)
-    elif args._class:
-        class_lookup(args)
-    elif args.race:
-        race_lookup(args)
-    elif args.url:
-        arbitrary_url_lookup(args)
-    else:
-        pass
+    args.no_color = not use_color(args, sys.stdout)
+    instruments = instrument.enable() if args.timings else None
+    profile = None
+    if args.profile:
+        import cProfile
+
+        profile = cProfile.Profile()
+        profile.enable()
+    try:
+        return run(args)
+    finally:
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(args.profile)
+        if instruments is not None:
+            instruments.report(sys.stderr)
+
+
+# Each mode imports what it runs on only once it is picked, so a --client
+# lookup never loads the parsing and rendering it leaves to the daemon
+def run(args):
+    if args.command == "mirror":
+        from itbrowz.mirror import run_mirror
+
+        run_mirror(args)
+        return
+    if args.serve:
+        from itbrowz.daemon import serve
+
+        return serve(args)
+    if args.search:
+        from itbrowz.search import run_search
+
+        return run_search(args)
+    targets = args.targets
+    if args.targets_file:
+        targets = targets + read_targets(args.targets_file)
+    if targets and args.pager:
+        from itbrowz.pager import run_pager
+
+        return run_pager(targets[0], args)
+    if targets and args.client:
+        return run_client(targets, args)
+    if targets and args.stream:
+        from itbrowz.batch import run_stream
+
+        return run_stream(targets, args)
+    if targets:
+        from itbrowz.batch import run_batch
+        from itbrowz.rendered import RenderCache
+
+        return run_batch(targets, args, render_cache=RenderCache())
 
 
 if __name__ == "__main__":
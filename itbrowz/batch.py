@@ -0,0 +1,130 @@
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional
+
+from .fetch import Fetcher
+from .itbrowz import (
+    FetchedPage,
+    cached_render,
+    fetch_target,
+    parse_target,
+    render_target,
+    stream_lookup,
+    write_rendered,
+)
+from .output import OutputSink
+from .rendered import RenderedPage
+from .targets import Target
+
+SLUG_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+class TargetTimings(NamedTuple):
+    target: Target
+    fetch: float
+    parse: float
+    render: float
+    error: Optional[str]
+
+
+def output_path(directory, position, target):
+    slug = SLUG_RE.sub("_", target.name).strip("_")[:80]
+    return os.path.join(directory, f"{position:03d}-{target.kind}-{slug}.txt")
+
+
+class LoadedTarget(NamedTuple):
+    page: FetchedPage
+    root: Optional[object]
+    rendered: Optional[RenderedPage]
+    width: int
+    fetch: float
+    parse: float
+
+
+# A render cache hit skips parsing; the cached output is written as is
+def load_target(target, args, fetcher, render_cache=None):
+    started = time.perf_counter()
+    page = fetch_target(target, args, fetcher)
+    fetched = time.perf_counter()
+    width = shutil.get_terminal_size()[0]
+    rendered = cached_render(page, args, render_cache, width)
+    if rendered is not None:
+        return LoadedTarget(page, None, rendered, width, fetched - started, 0)
+    root = parse_target(page)
+    if root is None:
+        raise LookupError(f"{page.url}: nothing to render")
+    parse_time = time.perf_counter() - fetched
+    return LoadedTarget(page, root, None, width, fetched - started, parse_time)
+
+
+def print_timings(timings, stream):
+    stream.write(f"{'target':<48} {'fetch':>9} {'parse':>9} {'render':>9}\n")
+    for t in timings:
+        label = f"{t.target.kind} {t.target.name}"[:48]
+        if t.error is not None:
+            stream.write(f"{label:<48} failed: {t.error}\n")
+            continue
+        stream.write(
+            f"{label:<48} {t.fetch * 1000:>7.1f}ms {t.parse * 1000:>7.1f}ms "
+            f"{t.render * 1000:>7.1f}ms\n"
+        )
+
+
+def show_target(loaded, args, out, render_cache):
+    if loaded.rendered is not None:
+        write_rendered(loaded.rendered, out)
+        return
+    render_target(loaded.page, loaded.root, args, out, render_cache, loaded.width)
+
+
+# Pages are fetched and parsed on a bounded pool while earlier ones render,
+# always in input order. Each target gets its own render and link numbering.
+def run_batch(targets, args, out=None, fetcher=None, render_cache=None):
+    if fetcher is None:
+        fetcher = Fetcher.from_args(args, pool_size=args.jobs)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    timings: List[TargetTimings] = []
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [
+            pool.submit(load_target, t, args, fetcher, render_cache) for t in targets
+        ]
+        for position, (target, future) in enumerate(zip(targets, futures), start=1):
+            try:
+                loaded = future.result()
+            except (LookupError, OSError) as e:
+                print(e, file=sys.stderr)
+                timings.append(TargetTimings(target, 0, 0, 0, str(e)))
+                continue
+            started = time.perf_counter()
+            if args.output_dir:
+                path = output_path(args.output_dir, position, target)
+                with OutputSink.to_file(path) as sink:
+                    show_target(loaded, args, sink, render_cache)
+            else:
+                show_target(loaded, args, out, render_cache)
+            render_time = time.perf_counter() - started
+            timings.append(
+                TargetTimings(target, loaded.fetch, loaded.parse, render_time, None)
+            )
+    if len(targets) > 1:
+        print_timings(timings, sys.stderr)
+    return 1 if any(t.error is not None for t in timings) else 0
+
+
+# Targets are streamed one at a time, each shown block by block while it is
+# still downloading. Nothing is read ahead and the render cache is not used.
+def run_stream(targets, args, out=None, fetcher=None):
+    fetcher = Fetcher.from_args(args) if fetcher is None else fetcher
+    status = 0
+    for target in targets:
+        try:
+            stream_lookup(target, args, out, fetcher)
+        except (LookupError, OSError) as e:
+            print(e, file=sys.stderr)
+            status = 1
+    return status
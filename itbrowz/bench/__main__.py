@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+
+from .runner import DEFAULT_THRESHOLD, compare, load, run, save
+from .startup import (
+    BASELINE_MODULES,
+    DEFAULT_STARTUP_FACTOR,
+    ENTRY_POINT,
+    check_client,
+    check_startup,
+    startup_times,
+)
+
+BENCH_COLUMNS = "120"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="itbrowz renderer benchmarks")
+    parser.add_argument(
+        "-n", "--repeat", type=int, dest="repeat", default=5, help="Runs per case"
+    )
+    parser.add_argument(
+        "--scale", type=int, dest="scale", default=1, help="Generated corpus size"
+    )
+    parser.add_argument(
+        "-k", type=str, dest="select", default="", help="Only run matching cases"
+    )
+    parser.add_argument(
+        "-o", "--output", type=str, dest="output", default="", help="Write JSON here"
+    )
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        type=str,
+        dest="baseline",
+        default="",
+        help="Earlier JSON results to compare against",
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        dest="threshold",
+        default=DEFAULT_THRESHOLD,
+        help="Allowed slowdown as a fraction of the baseline median",
+    )
+    parser.add_argument(
+        "--startup",
+        action="store_true",
+        dest="startup",
+        help="Measure CLI import time with -X importtime instead",
+    )
+    parser.add_argument(
+        "--startup-factor",
+        type=float,
+        dest="startup_factor",
+        default=DEFAULT_STARTUP_FACTOR,
+        help="Allowed CLI import time as a multiple of importing "
+        + ", ".join(BASELINE_MODULES),
+    )
+    args = parser.parse_args()
+    if args.startup:
+        return startup(args.startup_factor)
+    # Renderers read the terminal size, so pin it for comparable runs
+    os.environ["COLUMNS"] = BENCH_COLUMNS
+
+    results = run(args.repeat, args.scale, args.select)
+    for name, result in results["results"].items():
+        print(f"{name:<48} {result['median'] * 1000:>10.2f}ms")
+    if args.output:
+        save(results, args.output)
+    if args.baseline:
+        regressions = compare(results, load(args.baseline), args.threshold)
+        for name, ratio in sorted(regressions.items()):
+            print(f"REGRESSION {name}: {ratio:.2f}x baseline", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+# The budget scales with a baseline taken in the same run, so a slow or busy
+# machine doesn't fail the check by itself
+def startup(factor):
+    _, heavy = check_startup()
+    elapsed, baseline = startup_times()
+    budget = factor * baseline
+    print(f"{ENTRY_POINT:<48} {elapsed * 1000:>10.2f}ms")
+    print(f"{'baseline (stdlib imports)':<48} {baseline * 1000:>10.2f}ms")
+    for name in heavy:
+        print(f"REGRESSION {name} is imported at startup", file=sys.stderr)
+    client_heavy = check_client()
+    for name in client_heavy:
+        print(f"REGRESSION {name} is imported by --client", file=sys.stderr)
+    if elapsed > budget:
+        print(
+            f"REGRESSION startup took {elapsed * 1000:.0f}ms,"
+            f" budget is {budget * 1000:.0f}ms ({factor:g}x baseline)",
+            file=sys.stderr,
+        )
+        return 1
+    return 1 if heavy or client_heavy else 0
+
+
+if __name__ == "__main__":
+    exit(main())
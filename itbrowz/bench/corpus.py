@@ -0,0 +1,109 @@
+import os
+import random
+
+from bs4 import BeautifulSoup  # type: ignore
+
+from ..parsing import CONTAINER, DEFAULT_PARSER, parse_root
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+WORDS = (
+    "the a creature within range must make a saving throw on a failed save it "
+    "takes damage or half as much on a successful one spell slot level higher"
+).split()
+
+
+# Stand-ins for 5thsrd spell, class and race pages, with the same mkdocs
+# layout (navbar, long sidebar of links, main container).
+def fixture_pages():
+    pages = {}
+    for filename in sorted(os.listdir(FIXTURE_DIR)):
+        name, ext = os.path.splitext(filename)
+        if ext == ".html":
+            with open(os.path.join(FIXTURE_DIR, filename), "rb") as f:
+                pages[name] = f.read()
+    return pages
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def deep_divs(depth):
+    return "".join(f'<div class="d{i}">' for i in range(depth)) + (
+        "<p>bottom</p>" + "</div>" * depth
+    )
+
+
+# Lists nested `depth` deep, the shape that makes recursive rendering pass
+# every bit of text back up through each level
+def nested_tree(depth, parser=DEFAULT_PARSER):
+    html = "".join(f"<ul><li>item {i} <b>bold</b> tail" for i in range(depth))
+    wrapped = f'<div class="container">{html}{"</li></ul>" * depth}</div>'
+    return BeautifulSoup(wrapped, parser).find("div")
+
+
+def many_links(count, seed=0):
+    rng = random.Random(seed)
+    items = "".join(
+        f'<li><a href="/spells/{i}/">{sentence(rng, 3)}</a></li>' for i in range(count)
+    )
+    return f"<ul>{items}</ul>"
+
+
+def table(columns, rows, seed=0):
+    rng = random.Random(seed)
+    head = "".join(f"<th>column {c}</th>" for c in range(columns))
+    body = "".join(
+        "<tr>"
+        + "".join(
+            f"<td>{sentence(rng, rng.randint(1, 3))}</td>" for _ in range(columns)
+        )
+        + "</tr>"
+        for _ in range(rows)
+    )
+    return f"<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>"
+
+
+def large_table(columns, rows, parser=DEFAULT_PARSER):
+    return BeautifulSoup(table(columns, rows), parser).find("table")
+
+
+def long_paragraphs(count, words, seed=0):
+    rng = random.Random(seed)
+    return "".join(f"<p>{sentence(rng, words)}</p>" for _ in range(count))
+
+
+def generated_pages(scale=1):
+    return {
+        "deep-divs": deep_divs(30),
+        "many-links": many_links(2000 * scale),
+        "wide-table": table(12, 50 * scale),
+        "long-table": table(4, 2000 * scale),
+        "long-paragraphs": long_paragraphs(50 * scale, 400),
+    }
+
+
+def load_corpus(scale=1, parser=DEFAULT_PARSER):
+    corpus = {}
+    for name, content in fixture_pages().items():
+        corpus[f"5thsrd-{name}"] = parse_root(content, CONTAINER, parser).root
+    for name, html in generated_pages(scale).items():
+        wrapped = f'<div class="container">{html}</div>'
+        corpus[name] = BeautifulSoup(wrapped, parser).find("div")
+    return corpus
+
+
+def nested_lists(depth, width):
+    nested = list(range(width))
+    for _ in range(depth):
+        nested = [list(range(width)), nested, width]
+    return nested
+
+
+def table_data(columns, rows, seed=0):
+    rng = random.Random(seed)
+    head = [f"column {c}" for c in range(columns)]
+    body = [
+        [sentence(rng, rng.randint(1, 3)) for _ in range(columns)] for _ in range(rows)
+    ]
+    return head, body
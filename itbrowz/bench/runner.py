@@ -0,0 +1,153 @@
+import io
+import json
+import platform
+import statistics
+import time
+
+from ..itbrowz import TerminalRenderData, build_document, render_html
+from ..layout import LineLayout
+from ..output import OutputSink
+from ..renderers import (
+    element_renderer,
+    element_step,
+    recursive_element_renderer,
+    render_table_helper,
+)
+from ..styles import StyleTable
+from ..utils import deep_flatten
+from .corpus import (
+    large_table,
+    load_corpus,
+    long_paragraphs,
+    nested_lists,
+    nested_tree,
+    table_data,
+)
+
+BASE_URL = "https://5thsrd.org/spellcasting/spells/"
+# The recursive walk runs out of stack a little past this depth
+RECURSIVE_DEPTHS = (50, 100, 200)
+TRAVERSAL_DEPTHS = RECURSIVE_DEPTHS + (2000,)
+DEFAULT_THRESHOLD = 0.25
+
+
+def render_info():
+    return TerminalRenderData(BASE_URL, out=OutputSink(io.StringIO()))
+
+
+def lay_out(nodes, width=None):
+    info = render_info()
+    width = info.base_terminal_width if width is None else width
+    drain(LineLayout(width, info.styles).lay_out(nodes))
+
+
+# Tag dispatch on its own: one step per node, without walking into children
+def step_all(nodes):
+    info = render_info()
+    for node in nodes:
+        element_step(node, info)
+
+
+def drain(fragments):
+    for _ in fragments:
+        pass
+
+
+def time_call(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "runs": repeat,
+    }
+
+
+def cases(scale=1):
+    corpus = load_corpus(scale)
+    for name, root in corpus.items():
+        yield f"element_renderer/{name}", lambda root=root: lay_out(
+            element_renderer(root, render_info())
+        )
+        document = build_document(root.contents, render_info())
+        yield f"relayout/{name}", lambda nodes=document.nodes: lay_out(nodes, 80)
+        nodes = list(root.descendants)
+        yield f"element_step/{name}", lambda nodes=nodes: step_all(nodes)
+        yield f"render_html/{name}", lambda root=root: render_html(
+            root.contents, BASE_URL, OutputSink(io.StringIO()), StyleTable()
+        )
+    for columns, rows in ((8, 20000 * scale),):
+        table = large_table(columns, rows)
+        yield f"render_table/{columns}x{rows}", lambda t=table: lay_out(
+            element_renderer(t, render_info())
+        )
+        yield f"render_table/{columns}x{rows}-narrow", lambda t=table: lay_out(
+            element_renderer(t, render_info()), 60
+        )
+    for columns, rows in ((12, 50 * scale), (4, 2000 * scale)):
+        head, body = table_data(columns, rows)
+        yield f"render_table_helper/{columns}x{rows}", lambda h=head, b=body: (
+            lay_out([render_table_helper(h, b, render_info())])
+        )
+    for depth in TRAVERSAL_DEPTHS:
+        tree = nested_tree(depth)
+        yield f"traversal/explicit-stack/depth-{depth}", lambda t=tree: drain(
+            element_renderer(t, render_info())
+        )
+        if depth in RECURSIVE_DEPTHS:
+            yield f"traversal/recursive/depth-{depth}", lambda t=tree: drain(
+                recursive_element_renderer(t, render_info())
+            )
+    for depth in (10, 100):
+        nested = nested_lists(depth, 50)
+        yield f"deep_flatten/depth-{depth}", lambda n=nested: deep_flatten(n)
+    text = long_paragraphs(1, 20000 * scale)[3:-4]
+    yield "render_root_text/long-paragraph", lambda: lay_out(
+        render_info().render_root_text(text)
+    )
+    layout = LineLayout(80, StyleTable())
+    frame = render_info().frame
+    yield "clean_strings/long-paragraph", lambda: layout.clean_strings(text, frame)
+    # Same paragraph with some words in double-width CJK characters
+    wide = text.replace("spell", "\u546a\u6587")
+    yield "clean_strings/wide-paragraph", lambda: layout.clean_strings(wide, frame)
+
+
+def run(repeat=5, scale=1, select=""):
+    results = {}
+    for name, fn in cases(scale):
+        if select in name:
+            results[name] = time_call(fn, repeat)
+    return {
+        "python": platform.python_version(),
+        "repeat": repeat,
+        "scale": scale,
+        "results": results,
+    }
+
+
+# A case regresses when its median is more than `threshold` (a fraction)
+# slower than the same case in the baseline run.
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    regressions = {}
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or before["median"] <= 0:
+            continue
+        ratio = result["median"] / before["median"]
+        if ratio > 1 + threshold:
+            regressions[name] = ratio
+    return regressions
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save(results, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
@@ -0,0 +1,66 @@
+import re
+import subprocess
+import sys
+
+ENTRY_POINT = "itbrowz.__main__"
+HEAVY_MODULES = ("requests", "bs4", "termcolor", "lxml")
+# A --client lookup leaves rendering to the daemon, so not even the renderer
+# itself should be loaded
+CLIENT_HEAVY_MODULES = HEAVY_MODULES + ("itbrowz.itbrowz",)
+# The whole CLI run of a --client lookup, against a socket nobody listens on
+CLIENT_CODE = (
+    "import sys\n"
+    f"from {ENTRY_POINT} import main\n"
+    "sys.argv = ['itbrowz', '--client', '--socket', '/nonexistent', '-s', 'light']\n"
+    "main()\n"
+)
+# Stdlib modules the CLI needs anyway. Importing them is the yardstick for
+# how fast this machine and interpreter are, measured in the same run.
+BASELINE_MODULES = ("argparse", "json", "sqlite3", "concurrent.futures")
+# The CLI takes about 1.5 times the baseline; the budget leaves room for noise
+DEFAULT_STARTUP_FACTOR = 5.0
+STARTUP_RUNS = 3
+IMPORTTIME_RE = re.compile(r"^import time:\s*(\d+) \|\s*(\d+) \|( *)(\S+)$")
+
+
+# Runs `code` in a fresh interpreter under -X importtime and returns the
+# cumulative import time in seconds of every top-level module it loaded.
+def import_times(code=f"import {ENTRY_POINT}", python=sys.executable):
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if m is not None:
+            times[m.group(4)] = int(m.group(2)) / 1e6
+    return times
+
+
+def heavy_imports(times, modules=HEAVY_MODULES):
+    return sorted(
+        name for name in times if name in modules or name.split(".")[0] in modules
+    )
+
+
+def check_startup(code=f"import {ENTRY_POINT}"):
+    times = import_times(code)
+    return times.get(ENTRY_POINT, 0.0), heavy_imports(times)
+
+
+def check_client():
+    return heavy_imports(import_times(CLIENT_CODE), CLIENT_HEAVY_MODULES)
+
+
+# Best of a few runs for the CLI and for the baseline, in seconds
+def startup_times(runs=STARTUP_RUNS):
+    baseline_code = "import " + ", ".join(BASELINE_MODULES)
+    elapsed, baseline = [], []
+    for _ in range(runs):
+        elapsed.append(import_times().get(ENTRY_POINT, 0.0))
+        times = import_times(baseline_code)
+        baseline.append(sum(times.get(name, 0.0) for name in BASELINE_MODULES))
+    return min(elapsed), min(baseline)
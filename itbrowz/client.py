@@ -0,0 +1,68 @@
+import json
+import os
+import shutil
+import socket
+import struct
+import sys
+
+from .fetch import DEFAULT_CACHE_DIR
+
+DEFAULT_SOCKET_PATH = os.path.join(
+    os.getenv("XDG_RUNTIME_DIR") or os.path.dirname(DEFAULT_CACHE_DIR), "itbrowz.sock"
+)
+FRAME = struct.Struct(">cI")
+OUT, ERR, EXIT = b"o", b"e", b"x"
+
+
+def write_frame(stream, channel, payload):
+    stream.write(FRAME.pack(channel, len(payload)))
+    stream.write(payload)
+    stream.flush()
+
+
+def read_frame(stream):
+    header = stream.read(FRAME.size)
+    if len(header) < FRAME.size:
+        return None, b""
+    channel, size = FRAME.unpack(header)
+    return channel, stream.read(size)
+
+
+# The client only sends targets along with its own terminal width, color
+# setting and where pages may come from, then copies whatever the daemon
+# streams back. Nothing here needs more than the standard library, so a
+# --client lookup starts without loading any of the rendering.
+def run_client(targets, args, stdout=None, stderr=None):
+    stdout = sys.stdout.buffer if stdout is None else stdout
+    stderr = sys.stderr.buffer if stderr is None else stderr
+    request = {
+        "targets": [list(target) for target in targets],
+        "div": args.div,
+        "width": shutil.get_terminal_size().columns,
+        "color": not args.no_color,
+        "offline": args.offline,
+        "mirror": os.path.abspath(args.mirror),
+    }
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(args.socket)
+    except OSError:
+        sock.close()
+        print(
+            f"No itbrowz daemon on {args.socket} - start one with `itbrowz --serve`",
+            file=sys.stderr,
+        )
+        return 1
+    with sock, sock.makefile("rwb") as stream:
+        stream.write(json.dumps(request).encode("utf-8") + b"\n")
+        stream.flush()
+        while True:
+            channel, payload = read_frame(stream)
+            if channel == OUT:
+                stdout.write(payload)
+                stdout.flush()
+            elif channel == ERR:
+                stderr.write(payload)
+                stderr.flush()
+            else:
+                return int(payload) if channel == EXIT else 1
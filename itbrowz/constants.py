@@ -1,3 +1,5 @@
+import os
+
 # Formatting is as follows:
 # Latin is the key, the values are (superscript, subscript)
 UNICODE_MAP = {
@@ -69,3 +71,18 @@ UNICODE_MAP = {
     "(": ("\u207D", "\u208D"),
     ")": ("\u207E", "\u208E"),
 }
+
+SPELLS_URL = "https://5thsrd.org/spellcasting/spells/"
+CLASSES_URL = "https://5thsrd.org/character/classes/"
+RACES_URL = "https://5thsrd.org/character/races/"
+FAMILIES = {"spell": SPELLS_URL, "class": CLASSES_URL, "race": RACES_URL}
+
+# Defaults of the command line options, kept here so the CLI can set up its
+# arguments without importing what runs them
+DEFAULT_JOBS = 4
+DEFAULT_MIRROR_PATH = os.path.join(
+    os.getenv("XDG_DATA_HOME", os.path.expanduser("~/.local/share")),
+    "itbrowz",
+    "mirror.sqlite3",
+)
+DEFAULT_WORKERS = 8
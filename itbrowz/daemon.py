@@ -0,0 +1,190 @@
+import io
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import NamedTuple
+
+from .client import ERR, EXIT, OUT, write_frame
+from .fetch import Fetcher
+from .itbrowz import Document, Target, fetch_target, load_document, render_document
+from .output import OutputSink
+from .parsing import RootSelector
+from .styles import StyleTable
+
+DEFAULT_DOCUMENTS = 64
+DEFAULT_RENDERED = 256
+DEFAULT_MAX_AGE = 300
+
+
+# Entries older than max_age seconds count as misses, so pages held by a
+# long-running daemon are still revalidated every few minutes.
+class LRUCache:
+    def __init__(self, max_entries, max_age=DEFAULT_MAX_AGE):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            stored, value = entry
+            if time.monotonic() - stored > self.max_age:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class LoadedPage(NamedTuple):
+    url: str
+    base_url: str
+    selector: RootSelector
+    document: Document
+    loaded_at: float
+
+
+# Everything a lookup would normally rebuild per process stays warm here:
+# the pooled session inside the fetcher, width-independent layout trees per
+# (target, div) and rendered output per (url, selector, width, color). A new
+# width only re-runs line layout. Rendered entries carry the load time of
+# their tree, so a refreshed page never serves old output. Clients bring
+# their own --offline and --mirror: offline lookups share the page cache but
+# never go to the network, and trees are kept apart per mirror.
+class Daemon:
+    def __init__(
+        self,
+        args,
+        fetcher=None,
+        documents=DEFAULT_DOCUMENTS,
+        rendered=DEFAULT_RENDERED,
+        max_age=DEFAULT_MAX_AGE,
+    ):
+        self.args = args
+        self.fetcher = Fetcher.from_args(args) if fetcher is None else fetcher
+        self.offline_fetcher = Fetcher(cache=self.fetcher.cache, offline=True)
+        self.documents = LRUCache(documents, max_age)
+        self.rendered = LRUCache(rendered, max_age)
+
+    def load(self, target, div, offline=False, mirror=None):
+        mirror = self.args.mirror if mirror is None else mirror
+        key = (target, div, mirror)
+        page = self.documents.get(key)
+        if page is None:
+            args = SimpleNamespace(
+                **{**vars(self.args), "div": div, "offline": offline, "mirror": mirror}
+            )
+            fetcher = self.offline_fetcher if offline else self.fetcher
+            fetched = fetch_target(target, args, fetcher)
+            page = LoadedPage(
+                fetched.url,
+                fetched.base_url,
+                fetched.selector,
+                load_document(fetched),
+                time.monotonic(),
+            )
+            self.documents.put(key, page)
+        return page
+
+    def render(self, target, div, width, color, offline=False, mirror=None):
+        page = self.load(target, div, offline, mirror)
+        key = (page.url, page.selector, width, color, page.loaded_at)
+        output = self.rendered.get(key)
+        if output is None:
+            buffer = io.StringIO()
+            render_document(
+                page.document, OutputSink(buffer), StyleTable(enabled=color), width
+            )
+            output = buffer.getvalue().encode("utf-8")
+            self.rendered.put(key, output)
+        return output
+
+    # A failed target is reported to the client and the rest still go out.
+    # Anything unexpected is also logged here, but the client always gets
+    # its EXIT frame.
+    def handle(self, request, stream):
+        status = 0
+        for kind, name in request["targets"]:
+            try:
+                output = self.render(
+                    Target(kind, name),
+                    request.get("div", ""),
+                    request["width"],
+                    request["color"],
+                    request.get("offline", False),
+                    request.get("mirror"),
+                )
+            except (LookupError, OSError) as e:
+                write_frame(stream, ERR, f"{e}\n".encode("utf-8"))
+                status = 1
+                continue
+            except Exception as e:
+                traceback.print_exc()
+                message = f"itbrowz daemon failed on {name}: {e!r}\n"
+                write_frame(stream, ERR, message.encode("utf-8"))
+                status = 1
+                continue
+            write_frame(stream, OUT, output)
+        write_frame(stream, EXIT, str(status).encode("ascii"))
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if line:
+            self.server.daemon.handle(json.loads(line), self.wfile)
+
+
+class DaemonServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, daemon):
+        self.daemon = daemon
+        super().__init__(path, DaemonHandler)
+
+
+def socket_alive(path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def serve(args):
+    path = args.socket
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if os.path.exists(path):
+        if socket_alive(path):
+            print(f"An itbrowz daemon is already listening on {path}")
+            return 1
+        os.remove(path)
+    server = DaemonServer(path, Daemon(args))
+    print(f"Serving on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
+    return 0
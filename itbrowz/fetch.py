@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "itbrowz", "pages"
+)
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+POOL_SIZE = 8
+# Seconds to wait for a server to connect or send more of a response
+DEFAULT_TIMEOUT = 30
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+class NotCachedError(LookupError):
+    pass
+
+
+class BadResponseError(OSError):
+    pass
+
+
+class CachedPage(NamedTuple):
+    url: str
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+_last_stamp = 0
+_stamp_lock = threading.Lock()
+
+
+# Nanoseconds since the epoch, but never the same twice in a process, so
+# reads in quick succession still come out in order
+def access_stamp():
+    global _last_stamp
+    with _stamp_lock:
+        _last_stamp = max(time.time_ns(), _last_stamp + 1)
+        return _last_stamp
+
+
+# One file holds the body and a sidecar holds the validators along with an
+# access stamp, the LRU clock: reads restamp the sidecar, and eviction drops
+# the least recently used bodies until the cache fits in max_size bytes.
+# Sidecars are only read when something actually has to go.
+class DiskCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_size=DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    def path(self, url, suffix):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, url):
+        try:
+            with open(self.path(url, ".json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(self.path(url, ".body"), "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        self.touch(url, meta)
+        return CachedPage(url, body, meta.get("etag"), meta.get("last_modified"))
+
+    def touch(self, url, meta):
+        meta["used"] = access_stamp()
+        try:
+            self.write(self.path(url, ".json"), json.dumps(meta).encode())
+        except OSError:
+            pass
+
+    # Write then rename so concurrent fetches never see a partial entry
+    def write(self, path, data):
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def put(self, url, body, etag=None, last_modified=None):
+        os.makedirs(self.directory, exist_ok=True)
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "used": access_stamp(),
+        }
+        self.write(self.path(url, ".body"), body)
+        self.write(self.path(url, ".json"), json.dumps(meta).encode())
+        self.evict()
+
+    # Entries without a readable stamp count as the least recently used
+    def last_used(self, body_path):
+        try:
+            with open(body_path[: -len(".body")] + ".json", encoding="utf-8") as f:
+                return int(json.load(f).get("used", 0))
+        except (OSError, ValueError, TypeError):
+            return 0
+
+    def evict(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".body"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_size, entry.path))
+        total = sum(size for size, _ in entries)
+        if total <= self.max_size:
+            return
+        by_use = sorted((self.last_used(path), size, path) for size, path in entries)
+        for _, size, path in by_use:
+            if total <= self.max_size:
+                break
+            for stale in (path, path[: -len(".body")] + ".json"):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            total -= size
+
+
+def new_session(pool_size=POOL_SIZE):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    return session
+
+
+# Anything but a 2xx, of the expected content type if there is one, is an
+# error, so that its body never gets cached or used in place of the real thing
+def check_response(url, res, content_type=None):
+    if not 200 <= res.status_code < 300:
+        raise BadResponseError(f"{url} returned HTTP {res.status_code}")
+    if content_type is None:
+        return
+    received = res.headers.get("Content-Type", "")
+    if not received.startswith(content_type):
+        raise BadResponseError(f"{url} is {received or 'untyped'}, not {content_type}")
+
+
+# Every page fetch goes through here: a keep-alive session shared by all
+# lookups, plus revalidation against the disk cache with If-None-Match and
+# If-Modified-Since. In offline mode only the cache is consulted. The session
+# (and requests itself) is only created once something goes to the network.
+# Every request has a timeout, so a stalled server can't hold up exit.
+class Fetcher:
+    def __init__(
+        self,
+        cache=None,
+        offline=False,
+        session=None,
+        pool_size=POOL_SIZE,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        self.cache = cache
+        self.offline = offline
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._session = session
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                self._session = new_session(self.pool_size)
+            return self._session
+
+    @classmethod
+    def from_args(cls, args, pool_size=POOL_SIZE):
+        return cls(cache=DiskCache(), offline=args.offline, pool_size=pool_size)
+
+    def cached(self, url):
+        cached = self.cache.get(url) if self.cache is not None else None
+        if self.offline and cached is None:
+            raise NotCachedError(f"{url} is not cached and --offline was given")
+        return cached
+
+    def validators(self, cached):
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        return headers
+
+    # With a content_type (a prefix such as "image/") only a successful
+    # response of that type is accepted; otherwise any body is returned
+    def get(self, url, content_type=None):
+        cached = self.cached(url)
+        if self.offline:
+            return cached.body
+        res = self.session.get(
+            url, headers=self.validators(cached), timeout=self.timeout
+        )
+        if res.status_code == 304 and cached is not None:
+            return cached.body
+        if content_type is not None:
+            check_response(url, res, content_type)
+        if res.ok and self.cache is not None:
+            self.cache.put(
+                url,
+                res.content,
+                res.headers.get("ETag"),
+                res.headers.get("Last-Modified"),
+            )
+        return res.content
+
+    # Like get, but hands the body over chunk by chunk as it arrives. The
+    # cache entry is only written once the whole body has been read. Nothing
+    # is handed over unless the response is a 2xx, as part of a body can't
+    # be taken back.
+    def stream(self, url, chunk_size=STREAM_CHUNK_SIZE):
+        cached = self.cached(url)
+        if self.offline:
+            yield cached.body
+            return
+        res = self.session.get(
+            url, headers=self.validators(cached), stream=True, timeout=self.timeout
+        )
+        with res:
+            if res.status_code == 304 and cached is not None:
+                yield cached.body
+                return
+            check_response(url, res)
+            # The body is only held on to when it is going to be cached
+            chunks = []
+            keep = self.cache is not None
+            for chunk in res.iter_content(chunk_size):
+                if keep:
+                    chunks.append(chunk)
+                yield chunk
+        if self.cache is not None:
+            self.cache.put(
+                url,
+                b"".join(chunks),
+                res.headers.get("ETag"),
+                res.headers.get("Last-Modified"),
+            )
@@ -0,0 +1,98 @@
+import io
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Tuple
+
+from .fetch import DEFAULT_CACHE_DIR, DiskCache, Fetcher
+
+DEFAULT_IMAGE_CACHE_DIR = os.path.join(os.path.dirname(DEFAULT_CACHE_DIR), "images")
+DEFAULT_IMAGE_CACHE_SIZE = 64 * 1024 * 1024
+DEFAULT_IMAGE_WORKERS = 8
+# Images are extras, so a slow one is given up on sooner than a page
+IMAGE_TIMEOUT = 10
+# Rough width of one terminal column in pixels
+CELL_PIXELS = 8
+
+
+# Scales an image down to `columns` terminal columns. Pillow is optional:
+# without it the original is sent as is and the terminal does the scaling.
+# Returns None for anything that isn't an image Pillow can read.
+def shrink(data, columns):
+    try:
+        from PIL import Image  # type: ignore
+    except ImportError:
+        return data
+    max_width = columns * CELL_PIXELS
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.width <= max_width:
+                return data
+            height = max(1, image.height * max_width // image.width)
+            resized = image.resize((max_width, height))
+            jpeg = image.format == "JPEG" and resized.mode in ("RGB", "L")
+            out = io.BytesIO()
+            resized.save(out, "JPEG" if jpeg else "PNG")
+            return out.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+# Downloads and shrinks the images of a page on a small pool. Renderers ask
+# for each image as they reach it, so downloads run while the rest of the
+# page is still being rendered, and layout only waits on an image when it
+# gets to it. Shrunk images are kept on disk per (url, columns), so a page
+# seen again at the same width needs no network at all.
+class ImageLoader:
+    def __init__(self, fetcher, cache=None, workers=DEFAULT_IMAGE_WORKERS):
+        self.fetcher = fetcher
+        self.cache = cache
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.pending: Dict[Tuple[str, int], Future] = {}
+        self.lock = threading.Lock()
+
+    # Originals go to the image cache only, not the page cache
+    @classmethod
+    def from_args(cls, args, workers=DEFAULT_IMAGE_WORKERS):
+        fetcher = Fetcher(
+            offline=args.offline, pool_size=workers, timeout=IMAGE_TIMEOUT
+        )
+        cache = DiskCache(DEFAULT_IMAGE_CACHE_DIR, DEFAULT_IMAGE_CACHE_SIZE)
+        return cls(fetcher, cache, workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def request(self, url, columns):
+        key = (url, columns)
+        with self.lock:
+            future = self.pending.get(key)
+            if future is None:
+                future = self.pending[key] = self.pool.submit(self.load, url, columns)
+        return future
+
+    def load(self, url, columns):
+        key = f"{url}\0{columns}"
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            return cached.body
+        data = shrink(self.fetcher.get(url, content_type="image/"), columns)
+        if data is not None and self.cache is not None:
+            self.cache.put(key, data)
+        return data
+
+    # None when the image could not be loaded, for whatever reason: a broken
+    # image is no reason to fail the page, which renders without it
+    def get(self, url, columns):
+        try:
+            return self.request(url, columns).result()
+        except Exception:
+            return None
+
+    def close(self):
+        for future in self.pending.values():
+            future.cancel()
+        self.pool.shutdown(wait=False)
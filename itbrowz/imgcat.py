@@ -3,15 +3,18 @@
 import argparse
 import base64
 import os
+from itertools import chain
+from urllib.parse import urlsplit
+
+from itbrowz.fetch import Fetcher
+from itbrowz.output import OutputSink
 
 ESCAPE = "\x1b"
 RIGHT_BRACKET = "\x5D"
 BACKSLASH = "\x5C"
 BELL = "\a"
-
-
-def shell_printf(arg):
-    print(arg, end="")
+# A multiple of 3, so whole chunks encode without padding
+CHUNK_SIZE = 3 * 64 * 1024
 
 
 # tmux requires unrecognized OSC sequences to be wrapped with DCS tmux;
@@ -19,7 +22,7 @@ def shell_printf(arg):
 # only accepts ESC backslash for ST. We use TERM instead of TMUX because TERM
 # gets passed through ssh.
 def operating_system_code():
-    term = os.getenv("TERM")
+    term = os.getenv("TERM", "")
     base_string = ESCAPE + RIGHT_BRACKET
     if "screen" in term:
         return ESCAPE + "Ptmux;" + ESCAPE + base_string
@@ -28,25 +31,74 @@ def operating_system_code():
 
 # More of the tmux workaround described above.
 def string_terminator():
-    term = os.getenv("TERM")
+    term = os.getenv("TERM", "")
     base_string = BELL
     if "screen" in term:
         return base_string + ESCAPE + BACKSLASH
     return base_string
 
 
-def print_image_in_iterm(filename):
+def file_chunks(path, chunk_size=CHUNK_SIZE):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+# base64 works on groups of 3 bytes, so the bytes that don't fill a group are
+# carried into the next chunk and only the very end gets padding. Each chunk
+# is encoded and handed on by itself; the whole image is never in memory.
+def encode_chunks(chunks):
+    carry = b""
+    for chunk in chunks:
+        data = carry + chunk if carry else chunk
+        cut = len(data) - len(data) % 3
+        carry = data[cut:]
+        if cut:
+            yield base64.b64encode(memoryview(data)[:cut]).decode("ascii")
+    if carry:
+        yield base64.b64encode(carry).decode("ascii")
+
+
+# iTerm2's inline image sequence, piece by piece. The size is optional (it
+# only drives the progress indicator), so streamed bodies of unknown length
+# leave it out.
+def image_sequence(name, chunks, size=None):
+    encoded_name = base64.b64encode(name.encode(encoding="utf-8")).decode("utf-8")
+    size_arg = f"size={size};" if size is not None else ""
+    yield operating_system_code()
+    yield "1337;File="
+    yield f"name={encoded_name};{size_arg}inline=1:"
+    yield from encode_chunks(chunks)
+    yield string_terminator()
+
+
+def write_image(out, name, chunks, size=None):
+    for piece in image_sequence(name, chunks, size):
+        out.write(piece)
+    out.write("\n")
+    out.flush()
+
+
+def print_image_in_iterm(filename, out=None):
     fn = os.path.abspath(filename)
-    with open(fn, "rb") as f:
-        file_contents = f.read()
     size = os.path.getsize(fn)
-    encoded_filename = base64.b64encode(fn.encode(encoding="utf-8")).decode("utf-8")
-    shell_printf(operating_system_code())
-    shell_printf("1337;File=")
-    shell_printf(f"name={encoded_filename};size={size};inline=1:")
-    shell_printf(base64.b64encode(file_contents).decode("utf-8"))
-    shell_printf(string_terminator())
-    print("")
+    out = OutputSink() if out is None else out
+    write_image(out, fn, file_chunks(fn), size)
+
+
+# The body goes from the socket into the encoder as it arrives. The first
+# chunk is read before anything is written, so a failed request leaves no
+# half-open escape sequence behind.
+def print_image_url(url, out=None, fetcher=None):
+    fetcher = Fetcher() if fetcher is None else fetcher
+    chunks = fetcher.stream(url)
+    first = next(chunks, b"")
+    name = urlsplit(url).path.rsplit("/", 1)[-1] or url
+    out = OutputSink() if out is None else out
+    write_image(out, name, chain([first], chunks))
 
 
 def main():
@@ -68,6 +120,11 @@ def main():
         help="File to print to terminal",
     )
     args = parser.parse_args()
+    if args.url:
+        try:
+            print_image_url(args.url)
+        except OSError:
+            print(f"Image at {args.url} could not be downloaded!")
     if args.filename:
         try:
             print_image_in_iterm(args.filename)
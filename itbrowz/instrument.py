@@ -0,0 +1,110 @@
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import DefaultDict
+
+PHASES = ("fetch", "parse", "render", "output")
+TOP_TAGS = 15
+
+
+# Hooks call straight into `active`, which is a NullInstruments unless
+# --timings turned recording on, so disabled hooks are a method call that
+# does nothing.
+class NullInstruments:
+    enabled = False
+    null_phase = nullcontext()
+
+    def phase(self, name):
+        return self.null_phase
+
+    def fetched(self, content):
+        pass
+
+    def parsed(self, page):
+        pass
+
+    def wrote(self, fragments):
+        pass
+
+    def rendered(self, tag, seconds):
+        pass
+
+
+class Instruments(NullInstruments):
+    enabled = True
+
+    def __init__(self):
+        self.times: DefaultDict[str, float] = defaultdict(float)
+        self.tags: Counter = Counter()
+        self.render_counts: Counter = Counter()
+        self.render_times: DefaultDict[str, float] = defaultdict(float)
+        self.bytes_fetched = 0
+        self.fragments = 0
+        self.fallbacks = 0
+        self.started = time.perf_counter()
+        import tracemalloc
+
+        tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] += time.perf_counter() - started
+
+    def fetched(self, content):
+        self.bytes_fetched += len(content)
+
+    def parsed(self, page):
+        if page.fell_back:
+            self.fallbacks += 1
+        if page.root is not None:
+            self.tags[page.root.name] += 1
+            self.tags.update(tag.name for tag in page.root.find_all(True))
+
+    def wrote(self, fragments):
+        self.fragments += fragments
+
+    # Time spent in a tag's renderer itself; its children count separately
+    def rendered(self, tag, seconds):
+        self.render_counts[tag] += 1
+        self.render_times[tag] += seconds
+
+    def report(self, stream):
+        import tracemalloc
+
+        total = time.perf_counter() - self.started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stream.write(f"{'phase':<10} {'wall':>10}\n")
+        for name in PHASES:
+            stream.write(f"{name:<10} {self.times[name] * 1000:>8.1f}ms\n")
+        stream.write(f"{'total':<10} {total * 1000:>8.1f}ms\n")
+        stream.write(f"bytes fetched:     {self.bytes_fetched}\n")
+        stream.write(f"fragments written: {self.fragments}\n")
+        stream.write(f"peak memory:       {peak / 1024:.0f} KiB\n")
+        stream.write(f"parse fallbacks:   {self.fallbacks}\n")
+        tags = " ".join(f"{n}={c}" for n, c in self.tags.most_common(TOP_TAGS))
+        stream.write(f"elements:          {tags}\n")
+        slowest = sorted(self.render_times, key=self.render_times.__getitem__)
+        handlers = " ".join(
+            f"{tag}={self.render_counts[tag]}/{self.render_times[tag] * 1000:.1f}ms"
+            for tag in reversed(slowest[-TOP_TAGS:])
+        )
+        stream.write(f"render by tag:     {handlers}\n")
+
+
+active = NullInstruments()
+
+
+def enable():
+    global active
+    active = Instruments()
+    return active
+
+
+def disable():
+    global active
+    active = NullInstruments()
@@ -1,180 +1,365 @@
 import shutil
-from dataclasses import dataclass
-from typing import List
-
-import requests
-from bs4 import BeautifulSoup  # type: ignore
-from termcolor import colored
+import sys
+from typing import List, NamedTuple, Optional, Tuple
 
+from itbrowz import instrument
+from itbrowz.constants import FAMILIES
+from itbrowz.fetch import Fetcher
+from itbrowz.images import ImageLoader
+from itbrowz.layout import LINE_BREAK, LineLayout, TextRun
+from itbrowz.links import LinkRegistry
+from itbrowz.mirror import Mirror
+from itbrowz.output import OutputSink, TeeStream
+from itbrowz.parsing import BODY, CONTAINER, RootSelector, parse_blocks, parse_root
+from itbrowz.rendered import RenderedPage
 from itbrowz.renderers import element_renderer
-from itbrowz.utils import (
-    deep_flatten,
-    eprint,
-    subscript_translate,
-    superscript_translate,
-)
-
-LINK_LIST: List[str] = ["FILLER"]
+from itbrowz.search import SearchIndex, index_path, normalize_name
+from itbrowz.styles import StyleTable
+from itbrowz.targets import Target
 
 
-def print_long_links():
-    for i in range(1, len(LINK_LIST)):
-        print(
-            colored(f"{i}: ", "red", attrs=[])
-            + colored(f"{LINK_LIST[i]}", "blue", attrs=["underline"])
+def print_long_links(links, out, styles):
+    for i, link_text in links:
+        out.write(
+            styles.paint(f"{i}: ", "red")
+            + styles.paint(f"{link_text}", "blue", ("underline",))
+            + "\n"
         )
 
 
-@dataclass
+class RenderFrame(NamedTuple):
+    color: str = "green"
+    attrs: Tuple[str, ...] = ()
+    div_depth: int = 0
+    list_depth: int = 0
+    span_depth: int = 0
+    link_text: str = ""
+    superscript: bool = False
+    subscript: bool = False
+
+
+# Page-wide values live on the object itself, while style and nesting state
+# live in a stack of immutable frames. Renderers open a child scope with
+# `with render_info.push(color="red"):` instead of deep-copying everything.
 class TerminalRenderData:
-    base_url: str
-    color: str
-    attrs: List[str]
-    div_depth: int
-    list_depth: int
-    span_depth: int
-    link_text: str
-    superscript: bool
-    subscript: bool
-    base_terminal_width: int
-
-    def __init__(self, base_url):
+    def __init__(
+        self, base_url, links=None, out=None, styles=None, width=None, images=None
+    ):
         self.base_url = base_url
+        self.images = images
+        self.links = LinkRegistry() if links is None else links
+        self.out = OutputSink() if out is None else out
+        self.styles = StyleTable() if styles is None else styles
         self.root_url = "https://" + base_url.split("/")[2]
-        self.color = "green"
-        self.attrs = []
-        self.div_depth = 0
-        self.list_depth = 0
-        self.span_depth = 0
-        self.link_text = ""
-        self.superscript = False
-        self.subscript = False
-        self.base_terminal_width = shutil.get_terminal_size()[0]
-
-    def consumed_width(self):
-        consumed_columns = (self.div_depth) * 2
-        if self.list_depth != 0:
-            return consumed_columns + (self.list_depth * 4) + 3
-        return consumed_columns
-
-    def available_terminal_width(self):
-        return self.base_terminal_width - self.consumed_width()
-
-    def clean_strings(self, base_string):
-        cut_strings = base_string.split("\n")
-        cleaned_strings = []
-        for string in cut_strings:
-            formatted_strings = [
-                str(string)[i : i + self.available_terminal_width()]
-                for i in range(0, len(string), self.available_terminal_width())
-            ]
-            for s in formatted_strings:
-                cleaned_strings.append(" ".join(s.split("\t")))
-        return cleaned_strings
-
-    def suffix(self, s):
-        padding_amount = (
-            self.available_terminal_width() - len(s) - (self.span_depth * 2)
-        )
-        if self.link_text != "":
-            link_number = 0
-            for i in range(1, len(LINK_LIST)):
-                if LINK_LIST[i] == self.link_text:
-                    link_number = i
-            padding_amount -= len(str(link_number)) + 2
-        pad_str = " " * padding_amount
-
-        div_bars = self.div_depth
-        if padding_amount <= 0:
-            div_bars += padding_amount
-
-        suffix = colored("}" * self.span_depth, "cyan", attrs=[])
-        suffix += colored(pad_str, self.color, attrs=[])
-        return suffix + colored("|" * div_bars, "white", attrs=[])
-
-    def prefix(self):
-        prefix = colored("|" * self.div_depth, "white", attrs=[])
-        if self.list_depth != 0:
-            prefix += colored(("    " * self.list_depth) + "-- ", "magenta", attrs=[])
-        if self.span_depth != 0:
-            prefix += colored("{" * self.span_depth, "cyan", attrs=[])
-
-        return prefix
-
-    def core(self, s):
-        if self.subscript:
-            s = superscript_translate(s)
-        if self.subscript:
-            s = subscript_translate(s)
-        base = colored(s, self.color, attrs=self.attrs)
-        if self.link_text != "":
-            link_number = 0
-            for i in range(1, len(LINK_LIST)):
-                if LINK_LIST[i] == self.link_text:
-                    link_number = i
-                    break
-            if link_number == 0:
-                LINK_LIST.append(self.link_text)
-                link_number = len(LINK_LIST) - 1
-            base += colored(f"[{link_number}]", "blue", attrs=["reverse"])
-        return base
+        if width is None:
+            width = shutil.get_terminal_size()[0]
+        self.base_terminal_width = width
+        self.frames: List[RenderFrame] = [RenderFrame()]
+
+    def push(self, **overrides):
+        self.frames.append(self.frames[-1]._replace(**overrides))
+        return self
+
+    def pop(self):
+        self.frames.pop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.pop()
+
+    @property
+    def frame(self):
+        return self.frames[-1]
+
+    @property
+    def color(self):
+        return self.frames[-1].color
+
+    @property
+    def attrs(self):
+        return self.frames[-1].attrs
+
+    @property
+    def div_depth(self):
+        return self.frames[-1].div_depth
+
+    @property
+    def list_depth(self):
+        return self.frames[-1].list_depth
+
+    @property
+    def span_depth(self):
+        return self.frames[-1].span_depth
+
+    @property
+    def link_text(self):
+        return self.frames[-1].link_text
 
+    @property
+    def superscript(self):
+        return self.frames[-1].superscript
+
+    @property
+    def subscript(self):
+        return self.frames[-1].subscript
+
+    # Text becomes a width-independent run; the link is numbered here, as
+    # long as the run has anything to show, so numbering follows the page
     def render_root_text(self, base_string):
-        elems = []
-        for s in self.clean_strings(base_string):
-            elems.append(self.prefix())
-            elems.append(self.core(s))
-            elems.append(self.suffix(s))
-        return elems
-
-
-def oops_i_wrote_a_browser(root_element, base_url):
-    render_html(root_element.contents, base_url)
-
-
-def spell_lookup(args):
-    base_url = "https://5thsrd.org/spellcasting/spells/"
-    res = requests.get(f"{base_url}{args.spell}")
-    text = BeautifulSoup(res.content, "html.parser")
-    root = text.body.find("div", class_="container", recursive=False)
-    oops_i_wrote_a_browser(root, base_url)
-
-
-def class_lookup(args):
-    base_url = "https://5thsrd.org/character/classes/"
-    res = requests.get(f"{base_url}{args._class}")
-    text = BeautifulSoup(res.content, "html.parser")
-    root = text.body.find("div", class_="container", recursive=False)
-    oops_i_wrote_a_browser(root, base_url)
-
-
-def race_lookup(args):
-    base_url = "https://5thsrd.org/character/races/"
-    res = requests.get(f"{base_url}{args.race}")
-    text = BeautifulSoup(res.content, "html.parser")
-    root = text.body.find("div", class_="container", recursive=False)
-    oops_i_wrote_a_browser(root, base_url)
-
-
-def arbitrary_url_lookup(args):
-    base_url = "/".join(args.url.split("/")[0:-1])
-    res = requests.get(args.url)
-    text = BeautifulSoup(res.content, "html.parser")
-    if args.div:
-        root = text.body.find("div", class_=args.div, recursive=False)
-        if root is None:
-            root = text.body.find("div", id=args.div, recursive=False)
+        text = str(base_string)
+        link_number = 0
+        if self.link_text != "" and text.replace("\n", ""):
+            link_number = self.links.register(self.link_text)
+        yield TextRun(text, self.frame, link_number)
+
+
+def oops_i_wrote_a_browser(root_element, base_url, args, out=None, width=None):
+    styles = StyleTable(enabled=not args.no_color)
+    if not args.images:
+        return render_html(root_element.contents, base_url, out, styles, width)
+    with ImageLoader.from_args(args) as images:
+        return render_html(root_element.contents, base_url, out, styles, width, images)
+
+
+class FetchedPage(NamedTuple):
+    target: Target
+    url: str
+    base_url: str
+    content: Optional[bytes]
+    selector: RootSelector
+
+
+# Works out where a target lives without touching the network. The content
+# is only filled in when the mirror already has the page.
+def resolve_target(target, args):
+    if target.kind == "url":
+        base_url = "/".join(target.name.split("/")[0:-1])
+        selector = RootSelector("div", args.div) if args.div else BODY
+        return FetchedPage(target, target.name, base_url, None, selector)
+    name = target.name
+    # Near-miss names are corrected locally before anything is fetched
+    index = SearchIndex.open(index_path(args.mirror))
+    if index is not None:
+        resolved = index.resolve(target.kind, name)
+        index.close()
+        if resolved is not None and resolved != normalize_name(name):
+            print(f"No {target.kind} named {name}, showing {resolved}", file=sys.stderr)
+        name = resolved or name
+    base_url = FAMILIES[target.kind]
+    url = f"{base_url}{name}"
+    mirror = Mirror.open(args.mirror)
+    if mirror is not None:
+        with instrument.active.phase("fetch"):
+            html = mirror.get(url)
+        mirror.close()
+        if html is not None:
+            # The mirror only holds the container itself
+            return FetchedPage(
+                target, url, base_url, html.encode("utf-8"), RootSelector("div")
+            )
+    return FetchedPage(target, url, base_url, None, CONTAINER)
+
+
+def fetch_target(target, args, fetcher=None):
+    page = resolve_target(target, args)
+    if page.content is not None:
+        return page
+    fetcher = Fetcher.from_args(args) if fetcher is None else fetcher
+    return page._replace(content=fetch_url(fetcher, page.url))
+
+
+def fetch_url(fetcher, url):
+    with instrument.active.phase("fetch"):
+        content = fetcher.get(url)
+    instrument.active.fetched(content)
+    return content
+
+
+def stream_url(fetcher, url):
+    chunks = fetcher.stream(url)
+    while True:
+        with instrument.active.phase("fetch"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        instrument.active.fetched(chunk)
+        yield chunk
+
+
+def parse_target(page):
+    with instrument.active.phase("parse"):
+        parsed = parse_root(page.content, page.selector)
+    instrument.active.parsed(parsed)
+    return parsed.root
+
+
+# Output with inline images is never cached; the images have their own cache
+def cached_render(page, args, render_cache, width):
+    if render_cache is None or args.images:
+        return None
+    return render_cache.get(page, width, not args.no_color)
+
+
+def write_rendered(rendered, out=None):
+    out = OutputSink() if out is None else out
+    out.write(rendered.output)
+    out.flush()
+
+
+def render_target(page, root, args, out=None, render_cache=None, width=None):
+    if render_cache is None or args.images:
+        oops_i_wrote_a_browser(root, page.base_url, args, out, width)
+        return
+    recorder = TeeStream(OutputSink() if out is None else out)
+    links = oops_i_wrote_a_browser(
+        root, page.base_url, args, OutputSink(recorder), width
+    )
+    rendered = RenderedPage(recorder.getvalue(), [text for _, text in links])
+    render_cache.put(page, width, not args.no_color, rendered)
+
+
+def lookup(target, args, out=None, fetcher=None, render_cache=None):
+    page = fetch_target(target, args, fetcher)
+    width = shutil.get_terminal_size()[0]
+    rendered = cached_render(page, args, render_cache, width)
+    if rendered is not None:
+        write_rendered(rendered, out)
+        return
+    render_target(page, parse_target(page), args, out, render_cache, width)
+
+
+def spell_lookup(args, out=None, fetcher=None):
+    lookup(Target("spell", args.spell), args, out, fetcher)
+
+
+def class_lookup(args, out=None, fetcher=None):
+    lookup(Target("class", args._class), args, out, fetcher)
+
+
+def race_lookup(args, out=None, fetcher=None):
+    lookup(Target("race", args.race), args, out, fetcher)
+
+
+def arbitrary_url_lookup(args, out=None, fetcher=None):
+    lookup(Target("url", args.url), args, out, fetcher)
+
+
+# Output starts with the first finished block instead of after the whole
+# page has downloaded. Pages already in the mirror are simply fed in whole.
+def stream_lookup(target, args, out=None, fetcher=None):
+    page = resolve_target(target, args)
+    if page.content is not None:
+        chunks = iter([page.content])
     else:
-        root = text.body
-    oops_i_wrote_a_browser(root, base_url)
+        fetcher = Fetcher.from_args(args) if fetcher is None else fetcher
+        chunks = stream_url(fetcher, page.url)
+    styles = StyleTable(enabled=not args.no_color)
+    blocks = parse_blocks(chunks, page.selector)
+    if not args.images:
+        return render_blocks(blocks, page.base_url, out, styles)
+    with ImageLoader.from_args(args) as images:
+        return render_blocks(blocks, page.base_url, out, styles, images=images)
+
+
+class Document(NamedTuple):
+    nodes: list
+    links: LinkRegistry
 
 
-def render_html(elements, base_url):
-    # Collect child elements together into a list
-    render_info = TerminalRenderData(base_url)
+def build_document(elements, render_info):
+    nodes = []
     for x in elements:
-        all_child_elements = deep_flatten(element_renderer(x, render_info))
-        for y in all_child_elements:
-            eprint(y)
-        eprint("\n")
-    print_long_links()
+        nodes.extend(element_renderer(x, render_info))
+        nodes.append(LINE_BREAK)
+    return Document(nodes, render_info.links)
+
+
+# A Document whose nodes are rendered only as layout gets to them, for the
+# pager: the first screen of a long page doesn't wait for the rest of it.
+# Blocks come in open and fill up as more() is called.
+class StreamedDocument:
+    def __init__(self, elements, render_info):
+        self.nodes: list = []
+        self.links = render_info.links
+        self.done = False
+        self.steps = self.render(elements, render_info)
+
+    def render(self, elements, render_info):
+        for x in elements:
+            for node in element_renderer(x, render_info, stream=True):
+                if node is not None:
+                    self.nodes.append(node)
+                yield
+            self.nodes.append(LINE_BREAK)
+            yield
+
+    # Renders one more step; False once the whole document is there
+    def more(self):
+        if self.done:
+            return False
+        try:
+            next(self.steps)
+        except StopIteration:
+            self.done = True
+        return not self.done
+
+    def finish(self):
+        while self.more():
+            pass
+        return self
+
+
+def load_document(page, stream=False):
+    root = parse_target(page)
+    if root is None:
+        raise LookupError(f"{page.url}: nothing to render")
+    render_info = TerminalRenderData(page.base_url)
+    if stream:
+        return StreamedDocument(root.contents, render_info)
+    return build_document(root.contents, render_info)
+
+
+# The only width-dependent step, so a document can be shown at any width
+def render_document(document, out, styles, width, images=None):
+    for fragment in LineLayout(width, styles, images).lay_out(document.nodes):
+        out.write(fragment)
+    out.flush()
+    print_long_links(document.links, out, styles)
+    out.flush()
+
+
+def render_html(elements, base_url, out=None, styles=None, width=None, images=None):
+    render_info = TerminalRenderData(
+        base_url, out=out, styles=styles, width=width, images=images
+    )
+    with instrument.active.phase("render"):
+        document = build_document(elements, render_info)
+        render_document(
+            document,
+            render_info.out,
+            render_info.styles,
+            render_info.base_terminal_width,
+            images,
+        )
+    return render_info.links
+
+
+# Renders batches of top-level elements one after another, flushing after
+# each, with link numbers carrying on across batches. A single batch gives
+# exactly what render_html gives for the same elements.
+def render_blocks(blocks, base_url, out=None, styles=None, width=None, images=None):
+    render_info = TerminalRenderData(
+        base_url, out=out, styles=styles, width=width, images=images
+    )
+    layout = LineLayout(render_info.base_terminal_width, render_info.styles, images)
+    out = render_info.out
+    for elements in blocks:
+        with instrument.active.phase("render"):
+            for fragment in layout.lay_out(build_document(elements, render_info).nodes):
+                out.write(fragment)
+        out.flush()
+    print_long_links(render_info.links, out, render_info.styles)
+    out.flush()
+    return render_info.links
@@ -0,0 +1,351 @@
+from itertools import chain
+from typing import List, Optional
+
+from .imgcat import image_sequence
+from .text import (
+    display_width,
+    subscript_translate,
+    superscript_translate,
+    wrap_line,
+    wrap_text,
+)
+
+
+# Rendering happens in two stages. The renderers walk the parsed tree once and
+# build these nodes, which carry text and style but no widths. LineLayout then
+# turns them into terminal lines for one particular width, so the same tree
+# can be laid out again after a resize without touching the soup.
+class TextRun:
+    __slots__ = ("text", "frame", "link_number")
+
+    def __init__(self, text, frame, link_number=0):
+        self.text = text
+        self.frame = frame
+        self.link_number = link_number
+
+
+class Rule:
+    __slots__ = ("frame",)
+
+    def __init__(self, frame):
+        self.frame = frame
+
+
+# A Block being streamed (see element_renderer) is laid out while its
+# children are still coming in; it is `complete` once the last one is there
+class Block:
+    __slots__ = ("title", "depth", "children", "complete")
+
+    def __init__(self, title, depth, children, complete=True):
+        self.title = title
+        self.depth = depth
+        self.children = children
+        self.complete = complete
+
+
+# Rows are lists of cell texts. A cell spanning several columns is followed
+# by one None per extra column it covers, and short rows are simply short.
+# `head` is None for tables without a header row. `widths` are the natural
+# column widths; layout shrinks them when the table doesn't fit.
+class TableBlock:
+    __slots__ = ("head", "rows", "widths", "frame")
+
+    def __init__(self, head, rows, widths, frame):
+        self.head = head
+        self.rows = rows
+        self.widths = widths
+        self.frame = frame
+
+
+class Picture:
+    __slots__ = ("url", "frame")
+
+    def __init__(self, url, frame):
+        self.url = url
+        self.frame = frame
+
+
+class LineBreak:
+    __slots__ = ()
+
+
+LINE_BREAK = LineBreak()
+
+
+# Where a node sits in the document: its index in each enclosing Block's
+# children, outermost first. Only yielded by layouts with `positions` set.
+class Position:
+    __slots__ = ("path",)
+
+    def __init__(self, path):
+        self.path = path
+
+
+# Pictures are only drawn when an ImageLoader is given; without one (the
+# pager, the daemon) they take up no lines at all.
+class LineLayout:
+    positions = False
+
+    def __init__(self, width, styles, images=None):
+        self.width = width
+        self.styles = styles
+        self.images = images
+        self.table_edges = None
+
+    def consumed_width(self, frame):
+        consumed_columns = (frame.div_depth) * 2
+        if frame.list_depth != 0:
+            return consumed_columns + (frame.list_depth * 4) + 3
+        return consumed_columns
+
+    def available_width(self, frame):
+        return self.width - self.consumed_width(frame)
+
+    # Past the point where nesting eats the whole width, one column is left
+    def clean_strings(self, base_string, frame):
+        return wrap_text(base_string, max(self.available_width(frame), 1))
+
+    def prefix(self, frame):
+        prefix = self.styles.paint("|" * frame.div_depth, "white")
+        if frame.list_depth != 0:
+            prefix += self.styles.paint(("    " * frame.list_depth) + "-- ", "magenta")
+        if frame.span_depth != 0:
+            prefix += self.styles.paint("{" * frame.span_depth, "cyan")
+        return prefix
+
+    def core(self, s, frame, link_number):
+        if frame.superscript:
+            s = superscript_translate(s)
+        if frame.subscript:
+            s = subscript_translate(s)
+        base = self.styles.paint(s, frame.color, frame.attrs)
+        if frame.link_text != "":
+            base += self.styles.paint(f"[{link_number}]", "blue", ("reverse",))
+        return base
+
+    def suffix(self, s, frame, link_number):
+        padding_amount = (
+            self.available_width(frame) - display_width(s) - (frame.span_depth * 2)
+        )
+        if frame.link_text != "":
+            padding_amount -= len(str(link_number)) + 2
+        pad_str = " " * padding_amount
+
+        div_bars = frame.div_depth
+        if padding_amount <= 0:
+            div_bars += padding_amount
+
+        suffix = self.styles.paint("}" * frame.span_depth, "cyan")
+        suffix += self.styles.paint(pad_str, frame.color)
+        return suffix + self.styles.paint("|" * div_bars, "white")
+
+    def text(self, run):
+        lines = self.clean_strings(run.text, run.frame)
+        if not lines:
+            return
+        prefix = self.prefix(run.frame)
+        for s in lines:
+            yield prefix
+            yield self.core(s, run.frame, run.link_number)
+            yield self.suffix(s, run.frame, run.link_number)
+
+    def rule(self, frame):
+        return self.styles.paint(
+            "|" * frame.div_depth
+            + ("    " * frame.list_depth)
+            + ("-" * self.available_width(frame))
+            + "|" * frame.div_depth,
+            "cyan",
+        )
+
+    def block_top(self, block):
+        paint = self.styles.paint
+        border_color = "white"
+        bars = "|" * block.depth
+        dashes = self.width - (2 * (block.depth + 1)) - len(block.title)
+        yield paint(bars, border_color)
+        yield paint("/", border_color)
+        yield paint(block.title + ("-" * dashes), border_color)
+        yield paint("\\", border_color)
+        yield paint(bars, border_color)
+
+    def block_bottom(self, block):
+        paint = self.styles.paint
+        border_color = "white"
+        bars = "|" * block.depth
+        dashes = self.width - (2 * (block.depth + 1)) - len(block.title)
+        yield paint(bars, border_color)
+        yield paint("\\", border_color)
+        yield paint("~" + block.title + ("-" * (dashes - 1)), border_color)
+        yield paint("/", border_color)
+        yield paint(bars, border_color)
+
+    def picture(self, picture):
+        if self.images is None:
+            return
+        data = self.images.get(picture.url, self.picture_columns(picture.frame))
+        if data:
+            yield from image_sequence(picture.url, [data], len(data))
+            yield "\n"
+
+    def picture_columns(self, frame):
+        return max(self.available_width(frame), 1)
+
+    def table_format_line(self, widths):
+        paint = self.styles.paint
+        parts = [paint("+", "yellow")]
+        for length in widths:
+            parts.append(paint("-", "yellow"))
+            parts.append(paint("-" * length, "yellow"))
+            parts.append(paint("-+", "yellow"))
+        parts.append(paint("\n", "yellow"))
+        return "".join(parts)
+
+    # The borders are the same on every row, so they are painted only once
+    def table_data_line(self, cells):
+        paint = self.styles.paint
+        if self.table_edges is None:
+            self.table_edges = [paint(edge, "yellow") for edge in ("|", " ", " |")]
+        left, gap, right = self.table_edges
+        parts = [left]
+        for text, width in cells:
+            parts.append(gap)
+            parts.append(paint(text + " " * (width - display_width(text)), "yellow"))
+            parts.append(right)
+        parts.append(paint("\n", "yellow"))
+        return "".join(parts)
+
+    def table_cells(self, widths, row):
+        if len(row) == len(widths) and None not in row:
+            return list(zip(row, widths))
+        cells = []
+        column = 0
+        while column < len(widths):
+            text = row[column] if column < len(row) else ""
+            span = 1
+            while column + span < len(row) and row[column + span] is None:
+                span += 1
+            span = min(span, len(widths) - column)
+            cells.append((text, sum(widths[column : column + span]) + 3 * (span - 1)))
+            column += span
+        return cells
+
+    # One row becomes one line, or several when a cell has to wrap
+    def table_row(self, widths, row):
+        cells = self.table_cells(widths, row)
+        for text, width in cells:
+            if display_width(text) > width:
+                break
+        else:
+            yield self.table_data_line(cells)
+            return
+        wrapped = [wrap_line(text, width) for text, width in cells]
+        for line in range(max(len(lines) for lines in wrapped)):
+            yield self.table_data_line(
+                [
+                    (lines[line] if line < len(lines) else "", width)
+                    for lines, (_, width) in zip(wrapped, cells)
+                ]
+            )
+
+    # Lines are produced a row at a time, so a table with thousands of rows
+    # is never formatted as a whole
+    def table(self, table):
+        if table.head is None and not table.rows:
+            return
+        widths = fit_widths(table.widths, self.available_width(table.frame))
+        yield self.table_format_line(widths)
+        if table.head is not None:
+            yield from self.table_row(widths, table.head)
+            yield self.table_format_line(widths)
+        for row in table.rows:
+            yield from self.table_row(widths, row)
+        yield self.table_format_line(widths)
+
+    # Nested Blocks are walked with an explicit stack, like the renderers, so
+    # deeply nested divs don't run into the recursion limit here either.
+    # `start` is a Position path to resume from; the tops of the Blocks it is
+    # inside are not laid out again. When nodes are still being rendered,
+    # `more` renders a few more and returns False once there are no more.
+    def lay_out(self, nodes, start=(), more=None):
+        if type(nodes) is not list:
+            nodes = list(nodes)
+        stack = [[nodes, 0, None]]
+        for depth, index in enumerate(start):
+            if depth == len(start) - 1:
+                stack[-1][1] = index
+            else:
+                block = stack[-1][0][index]
+                stack[-1][1] = index + 1
+                stack.append([block.children, 0, block])
+        while stack:
+            entry = stack[-1]
+            children, index, parent = entry
+            if index >= len(children):
+                if more is not None and (parent is None or not parent.complete):
+                    if more():
+                        continue
+                stack.pop()
+                if parent is not None:
+                    yield from self.block_bottom(parent)
+                continue
+            if self.positions:
+                yield Position(tuple(e[1] - 1 for e in stack[:-1]) + (index,))
+            entry[1] = index + 1
+            node = children[index]
+            kind = type(node)
+            if kind is TextRun:
+                yield from self.text(node)
+            elif kind is Block:
+                yield from self.block_top(node)
+                stack.append([node.children, 0, node])
+            elif kind is Rule:
+                yield self.rule(node.frame)
+            elif kind is TableBlock:
+                yield from self.table(node)
+            elif kind is Picture:
+                yield from self.picture(node)
+            elif kind is LineBreak:
+                yield "\n"
+
+
+# Natural column widths in one sweep over the rows. Spanning cells are set
+# aside and afterwards widen the last column they cover, if they need to.
+def table_widths(head: Optional[List], rows: List[List]) -> List[int]:
+    widths: List[int] = []
+    spanning = []
+    for row in chain((head,) if head is not None else (), rows):
+        if len(row) > len(widths):
+            widths.extend([0] * (len(row) - len(widths)))
+        for column, text in enumerate(row):
+            if text is None:
+                continue
+            if column + 1 < len(row) and row[column + 1] is None:
+                spanning.append((column, row))
+            elif display_width(text) > widths[column]:
+                widths[column] = display_width(text)
+    for column, row in spanning:
+        end = column + 1
+        while end < len(row) and row[end] is None:
+            end += 1
+        covered = sum(widths[column:end]) + 3 * (end - column - 1)
+        size = display_width(row[column])
+        if size > covered:
+            widths[end - 1] += size - covered
+    return widths
+
+
+# Shrinks columns until the table fits in `available` columns. Narrow
+# columns keep their width and the wide ones share what is left evenly.
+def fit_widths(widths: List[int], available: int) -> List[int]:
+    room = available - 1 - 3 * len(widths)
+    if sum(widths) <= room:
+        return widths
+    fitted = list(widths)
+    for position, column in enumerate(
+        sorted(range(len(widths)), key=widths.__getitem__)
+    ):
+        share = max(room // (len(widths) - position), 1)
+        fitted[column] = min(widths[column], share)
+        room -= fitted[column]
+    return fitted
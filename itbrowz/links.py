@@ -0,0 +1,26 @@
+from typing import Dict, List
+
+
+# Numbers are handed out in the order links are first rendered, starting at 1
+# so they match the footnote-style markers printed next to link text.
+class LinkRegistry:
+    def __init__(self):
+        self.links: List[str] = []
+        self.numbers: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.links)
+
+    def __iter__(self):
+        return iter(enumerate(self.links, start=1))
+
+    def register(self, link_text):
+        link_number = self.numbers.get(link_text)
+        if link_number is None:
+            self.links.append(link_text)
+            link_number = len(self.links)
+            self.numbers[link_text] = link_number
+        return link_number
+
+    def number(self, link_text):
+        return self.numbers.get(link_text, 0)
@@ -0,0 +1,197 @@
+import os
+import re
+import sqlite3
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import urldefrag, urljoin
+
+from .constants import DEFAULT_MIRROR_PATH, DEFAULT_WORKERS, FAMILIES
+from .fetch import DEFAULT_TIMEOUT, new_session
+from .parsing import CONTAINER, parse_root
+from .search import build_index, index_path
+
+HREF_RE = re.compile(r"""href\s*=\s*["']([^"'#?]+)""", re.I)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    family TEXT NOT NULL,
+    name TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    links TEXT NOT NULL,
+    html BLOB
+)
+"""
+
+
+class CrawledPage(NamedTuple):
+    url: str
+    status: int
+    etag: Optional[str]
+    last_modified: Optional[str]
+    links: str
+    html: Optional[bytes]
+
+
+def mirror_key(url):
+    return url.rstrip("/")
+
+
+def family_links(markup, page_url, base_url):
+    names = set()
+    for href in HREF_RE.findall(markup):
+        url = urldefrag(urljoin(page_url, href))[0]
+        if url.startswith(base_url):
+            name = url[len(base_url) :].strip("/")
+            if name and "/" not in name:
+                names.add(name)
+    return names
+
+
+# A local copy of the 5thsrd pages behind --spell, --class and --race. Only
+# the div.container each lookup renders is kept, zlib-compressed, in a single
+# SQLite file, along with the validators needed for an incremental re-crawl.
+class Mirror:
+    def __init__(self, path=DEFAULT_MIRROR_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute(SCHEMA)
+
+    @classmethod
+    def open(cls, path=DEFAULT_MIRROR_PATH):
+        return cls(path) if os.path.exists(path) else None
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def get(self, url):
+        row = self.db.execute(
+            "SELECT html FROM pages WHERE url = ?", (mirror_key(url),)
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def pages(self, family=None):
+        query = "SELECT family, name, url, html FROM pages WHERE html IS NOT NULL"
+        if family is not None:
+            rows = self.db.execute(query + " AND family = ?", (family,))
+        else:
+            rows = self.db.execute(query)
+        for family_, name, url, html in rows:
+            yield family_, name, url, zlib.decompress(html).decode("utf-8")
+
+    def validators(self, family):
+        rows = self.db.execute(
+            "SELECT url, etag, last_modified, links FROM pages WHERE family = ?",
+            (family,),
+        )
+        return {
+            url: (etag, last_modified, links)
+            for url, etag, last_modified, links in rows
+        }
+
+    def store(self, family, name, page):
+        if page.status == 304:
+            return
+        self.db.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                mirror_key(page.url),
+                family,
+                name,
+                page.etag,
+                page.last_modified,
+                page.links,
+                page.html,
+            ),
+        )
+
+
+def crawl_page(session, url, base_url, known):
+    headers = {}
+    if known is not None:
+        etag, last_modified, links = known
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    res = session.get(url, headers=headers, timeout=DEFAULT_TIMEOUT)
+    if res.status_code == 304 and known is not None:
+        return CrawledPage(url, 304, None, None, known[2], None)
+    res.raise_for_status()
+    page = parse_root(res.content, CONTAINER)
+    markup = res.content.decode(res.encoding or "utf-8", errors="replace")
+    links = "\n".join(sorted(family_links(markup, url, base_url)))
+    html = zlib.compress(str(page.root).encode("utf-8")) if page.root else None
+    return CrawledPage(
+        url,
+        res.status_code,
+        res.headers.get("ETag"),
+        res.headers.get("Last-Modified"),
+        links,
+        html,
+    )
+
+
+# Breadth-first over every page linked from the family index that lives
+# directly under the family URL, fetching on a bounded thread pool. Pages
+# already in the mirror are revalidated with conditional requests.
+def crawl_family(mirror, family, session, workers=DEFAULT_WORKERS, base_url=None):
+    base_url = FAMILIES[family] if base_url is None else base_url
+    known = mirror.validators(family)
+    seen = {""}
+    frontier = [""]
+    counts: Dict[int, int] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while frontier:
+            futures = {
+                pool.submit(
+                    crawl_page,
+                    session,
+                    base_url + name + ("/" if name else ""),
+                    base_url,
+                    known.get(mirror_key(base_url + name)),
+                ): name
+                for name in frontier
+            }
+            frontier = []
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    page = future.result()
+                except OSError:
+                    counts[-1] = counts.get(-1, 0) + 1
+                    continue
+                counts[page.status] = counts.get(page.status, 0) + 1
+                mirror.store(family, name, page)
+                for link in page.links.split("\n") if page.links else ():
+                    if link not in seen:
+                        seen.add(link)
+                        frontier.append(link)
+            mirror.db.commit()
+    return counts
+
+
+def run_mirror(args):
+    mirror = Mirror(args.mirror)
+    session = new_session(args.workers)
+    try:
+        for family in args.families or list(FAMILIES):
+            counts = crawl_family(mirror, family, session, args.workers)
+            print(
+                f"{family}: {counts.get(200, 0)} fetched, "
+                f"{counts.get(304, 0)} unchanged, {counts.get(-1, 0)} failed"
+            )
+        documents = build_index(mirror, index_path(args.mirror))
+        print(f"search index: {documents} pages")
+    finally:
+        mirror.close()
@@ -0,0 +1,70 @@
+import sys
+from typing import List
+
+from . import instrument
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+
+# Rendering produces a huge number of tiny fragments, so they are collected
+# here and handed to the underlying stream in large chunks. Anything with a
+# `write` method works as a target: stdout, an open file or an io.StringIO.
+class OutputSink:
+    def __init__(self, stream=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.buffer: List[str] = []
+        self.buffered = 0
+        self.fragments = 0
+
+    @classmethod
+    def to_file(cls, path, buffer_size=DEFAULT_BUFFER_SIZE):
+        return cls(open(path, "w", encoding="utf-8"), buffer_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, fragment):
+        self.buffer.append(fragment)
+        self.buffered += len(fragment)
+        self.fragments += 1
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        # Resolve stdout lazily so redirections made after construction apply
+        stream = sys.stdout if self.stream is None else self.stream
+        with instrument.active.phase("output"):
+            if self.buffer:
+                stream.write("".join(self.buffer))
+                self.buffer = []
+                self.buffered = 0
+            stream.flush()
+        instrument.active.wrote(self.fragments)
+        self.fragments = 0
+
+    def close(self):
+        self.flush()
+        if self.stream is not None and self.stream not in (sys.stdout, sys.stderr):
+            self.stream.close()
+
+
+# Passes everything on to another stream while keeping a copy, so a render
+# can be shown and cached at the same time
+class TeeStream:
+    def __init__(self, stream):
+        self.stream = stream
+        self.parts: List[str] = []
+
+    def write(self, text):
+        self.parts.append(text)
+        self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def getvalue(self):
+        return "".join(self.parts)
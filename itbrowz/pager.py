@@ -0,0 +1,391 @@
+import bisect
+import re
+from types import SimpleNamespace
+
+from .fetch import Fetcher
+from .itbrowz import (
+    StreamedDocument,
+    Target,
+    fetch_target,
+    load_document,
+    print_long_links,
+)
+from .layout import LineLayout, Position
+from .prefetch import Prefetcher
+from .styles import StyleTable
+from .text import display_width, fit_columns
+
+DEFAULT_WINDOW = 512
+LOOKAHEAD = 64
+CHECKPOINT_LINES = 32
+TOKEN_RE = re.compile(r"\x1b\[[0-9;]*m|[^\x1b]+")
+SGR_COLORS = {
+    "30": "black",
+    "31": "dark red",
+    "32": "dark green",
+    "33": "brown",
+    "34": "dark blue",
+    "35": "dark magenta",
+    "36": "dark cyan",
+    "37": "light gray",
+}
+SGR_ATTRS = {"1": "bold", "4": "underline", "5": "blink", "7": "standout"}
+HELP = "q quit  <n>g jump to link  <n>f follow link  b back"
+
+
+class LinkMark:
+    __slots__ = ("number",)
+
+    def __init__(self, number):
+        self.number = number
+
+
+# Where laying out can resume: a node's Position path, the cutter's state
+# just before it, and the line that state is on
+class Checkpoint:
+    __slots__ = ("path", "state", "line_no")
+
+    def __init__(self, path, state=None, line_no=0):
+        self.path = path
+        self.state = state
+        self.line_no = line_no
+
+
+# Notes where each numbered link first shows up, so the pager can jump to it
+class MarkingLayout(LineLayout):
+    positions = True
+
+    def text(self, run):
+        if run.link_number:
+            yield LinkMark(run.link_number)
+        yield from super().text(run)
+
+
+# Cuts the fragment stream into terminal lines the way the terminal itself
+# would: at a newline or once `width` columns are filled, where a newline
+# right after a full line does not add a blank one. Colors still open at a
+# cut are reopened on the next line, so every line stands on its own. Marks
+# that arrive on a full line belong to the next one and wait for it. Each
+# Position comes out as a Checkpoint holding the cutter's state there, and
+# passing that state back in carries on exactly as cutting would have.
+def split_lines(fragments, width, state=None):
+    parts, active, held, column = [], [], [], 0
+    if state is not None:
+        parts, active, held = list(state[0]), list(state[1]), list(state[2])
+        column = state[3]
+    for fragment in fragments:
+        kind = type(fragment)
+        if kind is not str:
+            if kind is Position:
+                state = (tuple(parts), tuple(active), tuple(held), column)
+                yield Checkpoint(fragment.path, state)
+            elif column >= width:
+                held.append(fragment)
+            else:
+                yield fragment
+            continue
+        for token in TOKEN_RE.findall(fragment):
+            if token[0] == "\x1b":
+                parts.append(token)
+                if token == "\x1b[0m":
+                    active = []
+                else:
+                    active.append(token)
+                continue
+            while token:
+                if column >= width:
+                    yield "".join(parts)
+                    yield from held
+                    parts, column, held = list(active), 0, []
+                    if token[0] == "\n":
+                        token = token[1:]
+                        continue
+                newline = token.find("\n")
+                segment = token if newline < 0 else token[:newline]
+                count = fit_columns(segment, width - column)
+                if segment and not count:
+                    if column:
+                        # A wide character that doesn't fit starts a new line
+                        column = width
+                        continue
+                    count = 1
+                taken = segment[:count]
+                parts.append(taken)
+                column += display_width(taken)
+                token = token[count:]
+                if token and token[0] == "\n" and column < width:
+                    yield "".join(parts)
+                    parts, column = list(active), 0
+                    token = token[1:]
+    if column:
+        yield "".join(parts)
+    yield from held
+
+
+# Turns one line of escape-coded text into (display spec, text) pairs, with
+# specs spelled the way urwid's AttrSpec expects them
+def ansi_markup(line):
+    markup = []
+    color, attrs = "default", []
+    for token in TOKEN_RE.findall(line):
+        if token[0] != "\x1b":
+            spec = ",".join([color] + attrs)
+            if markup and markup[-1][0] == spec:
+                markup[-1] = (spec, markup[-1][1] + token)
+            else:
+                markup.append((spec, token))
+            continue
+        for code in token[2:-1].split(";"):
+            if code in ("", "0"):
+                color, attrs = "default", []
+            elif code in SGR_COLORS:
+                color = SGR_COLORS[code]
+            elif code in SGR_ATTRS and SGR_ATTRS[code] not in attrs:
+                attrs.append(SGR_ATTRS[code])
+    return markup
+
+
+# A document seen through a window of laid out lines. Only lines near the
+# last one asked for are kept; anything else is laid out again from the
+# closest checkpoint before the window, and checkpoints are kept every
+# CHECKPOINT_LINES lines wherever they fall, inside Blocks too, so moving
+# anywhere costs about a window of layout. Streamed documents are rendered
+# only as far as layout has got. Besides the window, memory use is a
+# checkpoint per CHECKPOINT_LINES lines and a line number per link.
+class VirtualDocument:
+    def __init__(self, document, width, styles, window=DEFAULT_WINDOW):
+        self.document = document
+        self.width = width
+        self.styles = styles
+        self.window = window
+        self.more = document.more if isinstance(document, StreamedDocument) else None
+        self.lines = {}
+        self.checkpoints = [Checkpoint(())]
+        self.checkpoint_lines = [0]
+        self.link_lines = {}
+        self.total = None
+        self.frontier = 0
+        self.cursor = None
+
+    # The long links at the end count as nodes after the document's own, so
+    # there are checkpoints among them too
+    def fragments(self, path):
+        layout = MarkingLayout(self.width, self.styles)
+        nodes = self.document.nodes
+        yield from layout.lay_out(nodes, path, self.more)
+        first = max(path[0] - len(nodes), 0) if path else 0
+        collected = []
+        out = SimpleNamespace(write=collected.append)
+        links = self.document.links.links
+        for number in range(first + 1, len(links) + 1):
+            yield Position((len(nodes) + number - 1,))
+            print_long_links([(number, links[number - 1])], out, self.styles)
+            yield from collected
+            collected.clear()
+
+    def produce(self, checkpoint):
+        line_no = checkpoint.line_no
+        fragments = self.fragments(checkpoint.path)
+        for item in split_lines(fragments, self.width, checkpoint.state):
+            kind = type(item)
+            if kind is str:
+                yield line_no, item
+                line_no += 1
+            elif kind is Checkpoint:
+                if line_no >= self.checkpoint_lines[-1] + CHECKPOINT_LINES:
+                    item.line_no = line_no
+                    self.checkpoints.append(item)
+                    self.checkpoint_lines.append(line_no)
+            else:
+                self.link_lines.setdefault(item.number, line_no)
+        self.total = line_no
+
+    # Carry on from where the last call stopped when that is at least as
+    # close as the nearest checkpoint, so scrolling down never starts over.
+    # Otherwise start before the window, so scrolling back up finds it full.
+    def start(self, n):
+        low = max(n - self.window // 2, 0)
+        index = bisect.bisect_right(self.checkpoint_lines, low) - 1
+        checkpoint = self.checkpoints[index]
+        if self.cursor is not None and checkpoint.line_no <= self.cursor[0] <= n:
+            return self.cursor
+        return checkpoint.line_no, self.produce(checkpoint)
+
+    def line(self, n):
+        if n < 0:
+            return None
+        line = self.lines.get(n)
+        if line is not None:
+            return line
+        if self.total is not None and n >= self.total:
+            return None
+        _, producer = self.start(n)
+        low, high = n - self.window // 2, n + LOOKAHEAD
+        for line_no, text in producer:
+            self.frontier = max(self.frontier, line_no + 1)
+            if line_no >= low:
+                self.lines[line_no] = text
+            if line_no >= high:
+                self.cursor = (line_no + 1, producer)
+                break
+        else:
+            self.cursor = None
+        if len(self.lines) > 2 * self.window:
+            keep = self.window // 2 + LOOKAHEAD
+            self.lines = {k: v for k, v in self.lines.items() if abs(k - n) <= keep}
+        return self.lines.get(n)
+
+    # Renders as much of a streamed document as it takes to get to the link
+    def known_links(self, number):
+        links = self.document.links
+        while len(links) < number and self.more is not None and self.more():
+            pass
+        return len(links)
+
+    def link_line(self, number):
+        if not 1 <= number <= self.known_links(number):
+            return None
+        while number not in self.link_lines and self.total is None:
+            self.line(self.frontier + self.window // 2)
+        return self.link_lines.get(number)
+
+    def link_url(self, number):
+        if not 1 <= number <= self.known_links(number):
+            return None
+        return link_urls(self.document)[number - 1]
+
+
+def link_urls(document):
+    return [link_text.strip("[]") for link_text in document.links.links]
+
+
+def open_page(url, selector, args, fetcher, stream=False):
+    page_args = SimpleNamespace(**{**vars(args), "div": selector.ident})
+    page = fetch_target(Target("url", url), page_args, fetcher)
+    return page, load_document(page, stream)
+
+
+# The viewer itself. urwid is only imported here, so everything above can be
+# used (and tested) without a terminal.
+def run_pager(target, args, fetcher=None):
+    import urwid  # type: ignore
+
+    fetcher = Fetcher.from_args(args) if fetcher is None else fetcher
+    styles = StyleTable(enabled=not args.no_color)
+    prefetcher = Prefetcher(args.prefetch) if args.prefetch else None
+    specs = {}
+
+    def widget(line):
+        markup = []
+        for spec, text in ansi_markup(line):
+            if spec not in specs:
+                specs[spec] = urwid.AttrSpec(spec, "default")
+            markup.append((specs[spec], text))
+        return urwid.Text(markup or "", wrap="clip")
+
+    class LineWalker(urwid.ListWalker):
+        def __init__(self, view):
+            self.view = view
+            self.focus = 0
+
+        def get_focus(self):
+            return self.get(self.focus)
+
+        def set_focus(self, position):
+            self.focus = position
+            self._modified()
+
+        def get(self, position):
+            line = self.view.line(position)
+            if line is None:
+                return None, None
+            return widget(line), position
+
+        def get_next(self, position):
+            return self.get(position + 1)
+
+        def get_prev(self, position):
+            return self.get(position - 1)
+
+    page = fetch_target(target, args, fetcher)
+    state = SimpleNamespace(
+        page=page,
+        document=load_document(page, stream=True),
+        history=[],
+        number="",
+        prefetch=True,
+    )
+    footer = urwid.Text(HELP)
+    walker = LineWalker(VirtualDocument(state.document, 80, styles))
+
+    class PageBox(urwid.ListBox):
+        def render(self, size, focus=False):
+            width = walker.view.width
+            if size[0] != width:
+                # Only line layout runs again; keep roughly the same spot
+                walker.view = VirtualDocument(state.document, size[0], styles)
+                walker.focus = (walker.focus or 0) * width // size[0]
+            canvas = super().render(size, focus)
+            # Links are only known as far as the page has been rendered, so
+            # prefetching waits for the first screen and takes its links
+            if state.prefetch:
+                state.prefetch = False
+                prefetch(state.page, state.document)
+            return canvas
+
+    def prefetch(page, document):
+        if prefetcher is not None:
+            prefetcher.start(
+                page.url,
+                link_urls(document),
+                lambda url: open_page(url, page.selector, args, fetcher),
+            )
+
+    def show(page, document, focus=0):
+        state.page, state.document = page, document
+        walker.view = VirtualDocument(document, walker.view.width, styles)
+        walker.set_focus(focus)
+        footer.set_text(f"{page.url}  |  {HELP}")
+        state.prefetch = True
+
+    def on_key(key):
+        if key in ("q", "Q"):
+            raise urwid.ExitMainLoop()
+        if isinstance(key, str) and key.isdigit():
+            state.number += key
+            footer.set_text(f"link {state.number}")
+            return
+        number, state.number = int(state.number or 0), ""
+        if key == "g":
+            line = walker.view.link_line(number)
+            if line is not None:
+                walker.set_focus(line)
+        elif key in ("f", "enter"):
+            url = walker.view.link_url(number)
+            if url is None:
+                footer.set_text(f"no link {number}")
+                return
+            loaded = prefetcher.take(url) if prefetcher is not None else None
+            try:
+                if loaded is None:
+                    loaded = open_page(
+                        url, state.page.selector, args, fetcher, stream=True
+                    )
+            except (LookupError, OSError) as e:
+                footer.set_text(str(e))
+                return
+            state.history.append((state.page, walker.focus))
+            show(*loaded)
+        elif key in ("b", "backspace") and state.history:
+            page, focus = state.history.pop()
+            show(page, load_document(page, stream=True), focus)
+
+    footer.set_text(f"{page.url}  |  {HELP}")
+    frame = urwid.Frame(PageBox(walker), footer=urwid.AttrMap(footer, "footer"))
+    palette = [("footer", "black", "light gray")]
+    try:
+        urwid.MainLoop(frame, palette, unhandled_input=on_key).run()
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
+    return 0
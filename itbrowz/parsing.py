@@ -0,0 +1,329 @@
+import codecs
+import re
+from importlib.util import find_spec
+from typing import NamedTuple, Optional
+
+from . import instrument
+
+# Only look lxml up here; bs4 imports it when a page is actually parsed
+DEFAULT_PARSER = "lxml" if find_spec("lxml") is not None else "html.parser"
+
+TAG_RE = re.compile(
+    r"<!--.*?-->|<![^>]*>|<\?[^>]*>"
+    r"|<(/?)([a-zA-Z][^\s/>]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>",
+    re.S,
+)
+ATTR_RE = re.compile(r"([^\s=/>]+)(?:\s*=\s*(?:\"([^\"]*)\"|'([^']*)'|([^\s>]+)))?")
+VOID_TAGS = frozenset(
+    [
+        "area",
+        "base",
+        "br",
+        "col",
+        "embed",
+        "hr",
+        "img",
+        "input",
+        "link",
+        "meta",
+        "param",
+        "source",
+        "track",
+        "wbr",
+    ]
+)
+RAW_TEXT_TAGS = frozenset(["script", "style", "textarea", "title"])
+# Bytes to wait for before settling on an encoding, enough to see a <meta>
+ENCODING_SNIFF_SIZE = 4096
+# Guesses read as UTF-8, which they are all subsets of
+READ_AS_UTF8 = frozenset(["utf-8", "utf8", "ascii", "us-ascii"])
+
+
+class RootSelector(NamedTuple):
+    name: str
+    ident: str = ""
+
+    def find(self, soup):
+        if not self.ident:
+            return soup.find(self.name)
+        root = soup.body.find(self.name, class_=self.ident, recursive=False)
+        if root is None:
+            root = soup.body.find(self.name, id=self.ident, recursive=False)
+        return root
+
+
+class ParsedPage(NamedTuple):
+    root: Optional[object]
+    parser: str
+    strained: bool
+    fell_back: bool
+
+
+CONTAINER = RootSelector("div", "container")
+BODY = RootSelector("body")
+
+
+def parse_attrs(attr_text):
+    return {
+        m.group(1).lower(): m.group(2) or m.group(3) or m.group(4) or ""
+        for m in ATTR_RE.finditer(attr_text)
+    }
+
+
+# A cheap tag scan that mirrors how the tree builder nests tags (void tags
+# never open, an end tag closes back to its most recent open match and stray
+# end tags are ignored) to find where the selected element starts and ends.
+# Only that slice is then handed to BeautifulSoup.
+def locate_root(markup, selector):
+    stack = []
+    start = None
+    id_match = None
+    pos = 0
+    while True:
+        m = TAG_RE.search(markup, pos)
+        if m is None:
+            break
+        pos = m.end()
+        if m.group(2) is None:
+            continue
+        name = m.group(2).lower()
+        if m.group(1):
+            if name in stack:
+                index = len(stack) - 1 - stack[::-1].index(name)
+                if start is not None and index <= start[1]:
+                    end = m.end() if index == start[1] else m.start()
+                    return start[0], end
+                del stack[index:]
+            continue
+        if start is None and name == selector.name:
+            if not selector.ident:
+                start = (m.start(), len(stack))
+            elif stack and stack[-1] == "body":
+                attrs = parse_attrs(m.group(3))
+                if selector.ident in attrs.get("class", "").split():
+                    start = (m.start(), len(stack))
+                elif id_match is None and attrs.get("id") == selector.ident:
+                    id_match = m.start()
+        if name in VOID_TAGS or m.group(3).rstrip().endswith("/"):
+            continue
+        if name in RAW_TEXT_TAGS:
+            close = re.compile(f"</{name}", re.I).search(markup, pos)
+            pos = len(markup) if close is None else close.start()
+        stack.append(name)
+    if start is not None:
+        return start[0], len(markup)
+    if id_match is not None:
+        span = locate_root(markup[id_match:], RootSelector(selector.name))
+        if span is not None:
+            return id_match + span[0], id_match + span[1]
+    return None
+
+
+def parse_root(content, selector, parser=None):
+    from bs4 import BeautifulSoup, SoupStrainer  # type: ignore
+    from bs4.dammit import UnicodeDammit  # type: ignore
+
+    parser = DEFAULT_PARSER if parser is None else parser
+    markup = UnicodeDammit(content, is_html=True).unicode_markup
+    span = locate_root(markup, selector) if markup is not None else None
+    if span is not None:
+        strainer = SoupStrainer(selector.name)
+        soup = BeautifulSoup(markup[span[0] : span[1]], parser, parse_only=strainer)
+        root = soup.find(selector.name)
+        if root is not None:
+            return ParsedPage(root, parser, strained=True, fell_back=False)
+    # The strainer missed, so parse everything and search the whole tree
+    soup = BeautifulSoup(content, parser)
+    return ParsedPage(selector.find(soup), parser, strained=False, fell_back=True)
+
+
+# locate_root for markup that is still arriving. Tags are only looked at once
+# they are complete, and every child of the root is handed back as markup as
+# soon as it closes. Text and comments between children go with the child
+# that follows, so no text node is ever cut in two. Only the markup not yet
+# scanned is kept as one string; a block's scanned text is collected in parts
+# and joined once, when the block closes. Only a class match is streamed:
+# like locate_root, a class match anywhere on the page wins over an id, and
+# whether one is still to come isn't known until the page ends. A page where
+# only the id matches goes to parse_root once it has arrived, which still
+# parses just the element.
+class BlockScanner:
+    def __init__(self, selector):
+        self.selector = selector
+        self.markup = ""
+        self.pos = 0
+        self.parts = []
+        self.stack = []
+        self.root_tag = None
+        self.root_depth = 0
+        self.block_start = 0
+        self.closed = False
+
+    def feed(self, text):
+        self.markup += text
+        return self.scan(self.complete_until(), final=False)
+
+    def finish(self):
+        blocks = self.scan(len(self.markup), final=True)
+        if self.root_tag is not None and not self.closed:
+            self.parts.append(self.markup[self.block_start :])
+            block = "".join(self.parts)
+            if block:
+                blocks.append(block)
+            self.closed = True
+        return blocks
+
+    # Everything before an unfinished tag or comment is safe to scan
+    def complete_until(self):
+        markup = self.markup
+        limit = len(markup)
+        last_open = markup.rfind("<")
+        if last_open >= 0 and markup.find(">", last_open) < 0:
+            limit = last_open
+        comment = markup.rfind("<!--", 0, limit)
+        if comment >= 0 and markup.find("-->", comment + 4) < 0:
+            limit = comment
+        return limit
+
+    def selects(self, m, stack):
+        if not self.selector.ident:
+            return True
+        if not stack or stack[-1] != "body":
+            return False
+        return self.selector.ident in parse_attrs(m.group(3)).get("class", "").split()
+
+    def scan(self, limit, final):
+        blocks = []
+        markup, stack, selector = self.markup, self.stack, self.selector
+        while not self.closed:
+            m = TAG_RE.search(markup, self.pos)
+            if m is None or m.end() > limit:
+                # Whatever comes before the next tag is plain text
+                text_end = limit if m is None else min(m.start(), limit)
+                self.pos = max(self.pos, text_end)
+                break
+            if m.group(2) is None:
+                self.pos = m.end()
+                continue
+            name = m.group(2).lower()
+            if m.group(1):
+                self.pos = m.end()
+                if name in stack:
+                    index = len(stack) - 1 - stack[::-1].index(name)
+                    if self.root_tag is not None and index <= self.root_depth:
+                        self.end_block(m.start(), blocks)
+                        self.closed = True
+                        break
+                    del stack[index:]
+                    if len(stack) == self.root_depth + 1:
+                        self.end_block(m.end(), blocks)
+                continue
+            raw_close = None
+            if name in RAW_TEXT_TAGS:
+                raw_close = re.compile(f"</{name}", re.I).search(markup, m.end())
+                if raw_close is None and not final:
+                    self.pos = m.start()
+                    break
+            self.pos = m.end()
+            if (
+                self.root_tag is None
+                and name == selector.name
+                and self.selects(m, stack)
+            ):
+                self.root_tag = m.group(0)
+                self.root_depth = len(stack)
+                self.block_start = m.end()
+            if name in VOID_TAGS or m.group(3).rstrip().endswith("/"):
+                if len(stack) == self.root_depth + 1:
+                    self.end_block(m.end(), blocks)
+                continue
+            if name in RAW_TEXT_TAGS:
+                self.pos = len(markup) if raw_close is None else raw_close.start()
+            stack.append(name)
+        self.consume()
+        return blocks
+
+    def end_block(self, end, blocks):
+        if self.root_tag is None:
+            return
+        self.parts.append(self.markup[self.block_start : end])
+        block = "".join(self.parts)
+        if block:
+            blocks.append(block)
+        self.parts = []
+        self.block_start = end
+
+    # Drops what has been scanned from the markup, keeping the open block's
+    # share of it in parts
+    def consume(self):
+        if self.root_tag is not None and not self.closed:
+            if self.pos > self.block_start:
+                self.parts.append(self.markup[self.block_start : self.pos])
+            self.block_start = 0
+        self.markup = self.markup[self.pos :]
+        self.pos = 0
+
+
+# The encoding is settled from the first few KB the way UnicodeDammit would
+# settle it for the whole page, then the rest is decoded as it arrives. A
+# head that is all ASCII says nothing about what follows, and UnicodeDammit
+# would go on to UTF-8 for a whole page that isn't ASCII, so that is what
+# ASCII is read as.
+def decode_chunks(chunks):
+    from bs4.dammit import UnicodeDammit  # type: ignore
+
+    head = b""
+    chunks = iter(chunks)
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= ENCODING_SNIFF_SIZE:
+            break
+    encoding = UnicodeDammit(head, is_html=True).original_encoding or "utf-8"
+    if encoding.lower().replace("_", "-") in READ_AS_UTF8:
+        encoding = "utf-8-sig"
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    yield decoder.decode(head)
+    for chunk in chunks:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+# Yields the children of the selected root a few at a time, each batch as
+# soon as its markup is complete. Each batch is parsed inside a copy of the
+# root's start tag, so it gets the same nodes as a parse of the whole page.
+# When the scanner finds no root the page is parsed whole, like parse_root.
+def parse_blocks(chunks, selector, parser=None):
+    from bs4 import BeautifulSoup, SoupStrainer  # type: ignore
+
+    parser = DEFAULT_PARSER if parser is None else parser
+    scanner = BlockScanner(selector)
+    raw = []
+
+    def parse(block):
+        markup = scanner.root_tag + block
+        with instrument.active.phase("parse"):
+            soup = BeautifulSoup(
+                markup + f"</{selector.name}>",
+                parser,
+                parse_only=SoupStrainer(selector.name),
+            )
+        root = soup.find(selector.name)
+        return [] if root is None else list(root.contents)
+
+    def encoded(chunks):
+        for chunk in chunks:
+            raw.append(chunk)
+            yield chunk
+
+    for text in decode_chunks(encoded(chunks)):
+        for block in scanner.feed(text):
+            yield parse(block)
+    blocks = scanner.finish()
+    if scanner.root_tag is None:
+        root = parse_root(b"".join(raw), selector, parser).root
+        if root is None:
+            raise LookupError("nothing to render")
+        yield list(root.contents)
+        return
+    for block in blocks:
+        yield parse(block)
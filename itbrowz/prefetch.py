@@ -0,0 +1,77 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict
+from urllib.parse import urldefrag, urlsplit
+
+DEFAULT_PREFETCH_WORKERS = 2
+DEFAULT_PREFETCH_BYTES = 4 * 1024 * 1024
+
+
+# Links on the same site come first, each group in the order the links
+# appear on the page. The page itself and non-HTTP links are dropped.
+def rank_links(page_url, urls):
+    host = urlsplit(page_url).netloc
+    page = urldefrag(page_url)[0]
+    seen = set()
+    same_site, other = [], []
+    for url in urls:
+        url = urldefrag(url)[0]
+        if not url.startswith(("http://", "https://")) or url == page or url in seen:
+            continue
+        seen.add(url)
+        (same_site if urlsplit(url).netloc == host else other).append(url)
+    return same_site + other
+
+
+# Loads the first `limit` ranked links of a page in the background with a
+# small pool. Once `byte_budget` bytes have come in for a page, the rest are
+# skipped. Starting on a new page drops whatever the last one had queued.
+class Prefetcher:
+    def __init__(
+        self,
+        limit,
+        workers=DEFAULT_PREFETCH_WORKERS,
+        byte_budget=DEFAULT_PREFETCH_BYTES,
+    ):
+        self.limit = limit
+        self.byte_budget = byte_budget
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.pending: Dict[str, Future] = {}
+        self.spent = 0
+        self.lock = threading.Lock()
+
+    def start(self, page_url, urls, load):
+        self.cancel()
+        with self.lock:
+            self.spent = 0
+        for url in rank_links(page_url, urls)[: self.limit]:
+            self.pending[url] = self.pool.submit(self.fetch, url, load)
+
+    def fetch(self, url, load):
+        with self.lock:
+            if self.spent >= self.byte_budget:
+                return None
+        page, document = load(url)
+        with self.lock:
+            self.spent += len(page.content)
+        return page, document
+
+    # Waits for a prefetch that is still in flight rather than starting the
+    # same fetch again. Returns None when the link was never prefetched.
+    def take(self, url):
+        future = self.pending.pop(urldefrag(url)[0], None)
+        if future is None or future.cancelled():
+            return None
+        try:
+            return future.result()
+        except (LookupError, OSError):
+            return None
+
+    def cancel(self):
+        for future in self.pending.values():
+            future.cancel()
+        self.pending = {}
+
+    def close(self):
+        self.cancel()
+        self.pool.shutdown(wait=False)
@@ -0,0 +1,58 @@
+import hashlib
+import json
+import os
+from typing import List, NamedTuple
+
+from .fetch import DEFAULT_CACHE_DIR, DiskCache
+
+DEFAULT_RENDER_CACHE_DIR = os.path.join(os.path.dirname(DEFAULT_CACHE_DIR), "rendered")
+DEFAULT_RENDER_CACHE_SIZE = 32 * 1024 * 1024
+# Bump whenever a renderer change alters output so older entries stop matching
+RENDERER_VERSION = 3
+
+
+class RenderedPage(NamedTuple):
+    output: str
+    links: List[str]
+
+
+# Finished output is stored on disk next to the page cache, keyed by the
+# fetched bytes rather than the URL, so an unchanged page at the same width
+# is written straight out without being parsed. Each entry is the link table
+# as one JSON line followed by the output itself.
+class RenderCache:
+    def __init__(
+        self, directory=DEFAULT_RENDER_CACHE_DIR, max_size=DEFAULT_RENDER_CACHE_SIZE
+    ):
+        self.entries = DiskCache(directory, max_size)
+
+    @staticmethod
+    def key(page, width, color):
+        return "\0".join(
+            [
+                str(RENDERER_VERSION),
+                hashlib.sha256(page.content).hexdigest(),
+                page.base_url,
+                page.selector.name,
+                page.selector.ident,
+                str(width),
+                "color" if color else "plain",
+            ]
+        )
+
+    def get(self, page, width, color):
+        cached = self.entries.get(self.key(page, width, color))
+        if cached is None:
+            return None
+        header, _, output = cached.body.partition(b"\n")
+        try:
+            links = json.loads(header)
+        except ValueError:
+            return None
+        return RenderedPage(output.decode("utf-8"), links)
+
+    def put(self, page, width, color, rendered):
+        body = json.dumps(rendered.links).encode("utf-8") + b"\n"
+        self.entries.put(
+            self.key(page, width, color), body + rendered.output.encode("utf-8")
+        )
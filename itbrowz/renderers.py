@@ -1,64 +1,123 @@
-import shutil
-from copy import deepcopy
+import time
+from typing import Callable, Dict, Iterable, NamedTuple, Optional
 
-from termcolor import colored
+from . import instrument
+from .layout import Block, LineLayout, Picture, Rule, TableBlock, table_widths
+from .utils import get_elem_link_attr
 
-from .utils import eprint, get_elem_link_attr
+MAX_COLSPAN = 1000
+# What text nodes are registered as; no tag can have this name
+TEXT = "#text"
 
 
+# An element that is rendered by rendering its children inside a new frame.
+# With a title, whatever the children produce is wrapped in a Block.
+class Descend(NamedTuple):
+    children: Iterable
+    overrides: dict
+    title: Optional[str] = None
+
+
+# Only text can be a bare newline. str() on a tag would serialize its whole
+# subtree, once per level of nesting.
+def is_newline(x):
+    return x.name is None and x == "\n"
+
+
+# Tag name -> renderer. A renderer takes the element and the render info and
+# returns what element_step does. Plugins can add tags or replace built-in
+# ones with register(); tags nobody registered go to `fallback`.
+RENDERERS: Dict[str, Callable] = {}
+
+
+def register(*names):
+    def decorator(renderer):
+        for name in names:
+            RENDERERS[name] = renderer
+        return renderer
+
+    return decorator
+
+
+@register(TEXT)
+def render_text(text, render_info):
+    return render_info.render_root_text(text)
+
+
+# Unknown tags are transparent by default: their children still render
+def render_children(elem, render_info):
+    return Descend(elem.contents, {})
+
+
+@register("ins", "br", "style", "input", "form")
+def render_nothing(elem, render_info):
+    return ()  # Nothing to emit
+
+
+# Makes unknown tags an error again, for finding tags worth supporting
+def render_unknown(elem, render_info):
+    raise NotImplementedError(f"{elem.name} not implemented yet")
+
+
+fallback: Callable = render_children
+
+
+# Returns the previous fallback, so it can be put back
+def set_fallback(renderer):
+    global fallback
+    previous, fallback = fallback, renderer
+    return previous
+
+
+@register("sup")
 def render_superscript(superscript, render_info):
-    r = deepcopy(render_info)
-    r.superscript = True
-    return [element_renderer(x, r) for x in superscript.contents]
+    return Descend(superscript.contents, {"superscript": True})
 
 
+@register("sub")
 def render_subscript(subscript, render_info):
-    r = deepcopy(render_info)
-    r.subscript = True
-    return [element_renderer(x, r) for x in subscript.contents]
+    return Descend(subscript.contents, {"subscript": True})
 
 
+@register("a")
 def render_link(link, render_info):
     href = get_elem_link_attr(link, render_info, "href")
-    r = deepcopy(render_info)
-    r.link_text = f"[{href}]"
-    return [element_renderer(x, r) for x in link.contents]
+    return Descend(link.contents, {"link_text": f"[{href}]"})
 
 
 # This will throw off alignments - thinking about a fix
+@register("span")
 def render_span(span, render_info):
-    r = deepcopy(render_info)
-    r.span_depth += 1
-    return [element_renderer(x, r) for x in span.contents if str(x) != "\n"]
+    return Descend(
+        (x for x in span.contents if not is_newline(x)),
+        {"span_depth": render_info.span_depth + 1},
+    )
 
 
+@register("ol", "ul", "nav")
 def render_list(list_, render_info):
-    r = deepcopy(render_info)
-    r.color = "magenta"
-    r.list_depth += 1
-    return [element_renderer(x, r) for x in list_.contents]
+    return Descend(
+        list_.contents, {"color": "magenta", "list_depth": render_info.list_depth + 1}
+    )
 
 
 # TODO: Implement this
+@register("script")
 def render_script(script, render_info):
-    return []
+    return ()
 
 
 def render_horizontal_line(render_info):
-    return colored(
-        "|" * render_info.div_depth
-        + ("    " * render_info.list_depth)
-        + ("-" * render_info.available_terminal_width())
-        + "|" * render_info.div_depth,
-        "cyan",
-        attrs=[],
-    )
+    return Rule(render_info.frame)
+
+
+@register("hr")
+def render_rule(hr, render_info):
+    return (render_horizontal_line(render_info),)
 
 
+@register("div", "center", "header", "footer", "main")
 def render_div(div, render_info):
-    border_color = "white"
-    r = deepcopy(render_info)
-    r.div_depth += 1
     div_attr_keys = list(div.attrs.keys())
     if "id" in div_attr_keys:
         div_title = div["id"]
@@ -68,186 +127,215 @@ def render_div(div, render_info):
         div_title = ""
     if div.name == "header" or div.name == "footer" or div.name == "main":
         div_title = div.name + " " + div_title
-    return [
-        [
-            colored("|" * render_info.div_depth, border_color, attrs=[]),
-            colored("/", border_color, attrs=[]),
-            colored(
-                div_title
-                + (
-                    "-"
-                    * (
-                        shutil.get_terminal_size().columns
-                        - (2 * r.div_depth)
-                        - len(div_title)
-                    )
-                ),
-                border_color,
-                attrs=[],
-            ),
-            colored("\\", border_color, attrs=[]),
-            colored("|" * render_info.div_depth, border_color, attrs=[]),
-        ],
-        [element_renderer(x, r) for x in div.contents if str(x) != "\n"],
-        [
-            colored("|" * render_info.div_depth, border_color, attrs=[]),
-            colored("\\", border_color, attrs=[]),
-            colored(
-                "~"
-                + div_title
-                + (
-                    "-"
-                    * (
-                        shutil.get_terminal_size().columns
-                        - (2 * r.div_depth)
-                        - len(div_title)
-                        - 1
-                    )
-                ),
-                border_color,
-                attrs=[],
-            ),
-            colored("/", border_color, attrs=[]),
-            colored("|" * render_info.div_depth, border_color, attrs=[]),
-        ],
-    ]
-
-
-# HACK HACK HACK
+    return Descend(
+        (x for x in div.contents if not is_newline(x)),
+        {"div_depth": render_info.div_depth + 1},
+        div_title,
+    )
+
+
+# Only drawn with --images. The download starts here, at the width the page
+# is being rendered for, so it runs while the rest of the page renders.
+@register("img")
+def render_image(img, render_info):
+    src = get_elem_link_attr(img, render_info, "src")
+    if render_info.images is None or not src:
+        return ()
+    layout = LineLayout(render_info.base_terminal_width, render_info.styles)
+    render_info.images.request(src, layout.picture_columns(render_info.frame))
+    return (Picture(src, render_info.frame),)
+
+
+# Come back to inline svg rendering later
+@register("svg")
+def render_svg(svg, render_info):
+    return ()
+
+
+@register("em", "i")
+def render_emphasis(elem, render_info):
+    return Descend(elem.contents, {"attrs": render_info.attrs + ("bold",)})
+
+
+@register("strong", "b")
+def render_strong(elem, render_info):
+    return Descend(elem.contents, {"attrs": render_info.attrs + ("underline",)})
+
+
+@register("code")
+def render_code(code, render_info):
+    return Descend(code.contents, {"color": "grey"})
+
+
+@register("p", "button", "noscript")
+def render_paragraph(elem, render_info):
+    return Descend(elem.contents, {"attrs": ()})
+
+
+@register("label")
+def render_label(label, render_info):
+    return Descend(label.contents, {"attrs": ("underline",)})
+
+
+@register("li")
+def render_list_item(item, render_info):
+    return Descend(item.contents, {"attrs": (), "color": "magenta"})
+
+
+@register("blockquote")
+def render_blockquote(quote, render_info):
+    return Descend(quote.contents, {"attrs": (), "color": "cyan"})
+
+
+@register("h1", "h2", "h3", "h4", "h5", "h6")
+def render_heading(heading, render_info):
+    return Descend(
+        heading.contents, {"attrs": render_info.attrs + ("reverse",), "color": "red"}
+    )
+
+
+# wbr is void, but lxml treats it as a container and nests the rest of the
+# parent inside it, so render anything it swallowed
+register("wbr")(render_children)
+
+
+def cell_span(cell):
+    colspan = cell.attrs.get("colspan")
+    if colspan is None:
+        return 1
+    try:
+        return min(max(int(colspan), 1), MAX_COLSPAN)
+    except ValueError:
+        return 1
+
+
+# One pass over the rows, taking the th/td cells of each. The first row is
+# the header when it sits in a thead or has only th cells.
 def render_table(table, render_info):
-    head = table.find("thead")
-    head_rows = head.find("tr")
-    row_head_data = [x.get_text() for x in head_rows.find_all("th")]
-    body = table.find("tbody")
-    body_rows = body.find_all("tr")
-    body_data = [[x.get_text() for x in row.find_all("td")] for row in body_rows]
-    render_table_helper(row_head_data, body_data, render_info)
+    head = None
+    rows = []
+    for tr in table.find_all("tr"):
+        row = []
+        header_cells = True
+        for cell in tr.children:
+            if cell.name != "td" and cell.name != "th":
+                continue
+            header_cells = header_cells and cell.name == "th"
+            row.append(" ".join(cell.get_text().split()))
+            span = cell_span(cell)
+            if span > 1:
+                row.extend([None] * (span - 1))
+        if not rows and head is None and (tr.parent.name == "thead" or header_cells):
+            head = row
+        else:
+            rows.append(row)
+    return render_table_helper(head, rows, render_info)
+
+
+# TABLES AND IMAGES ARE HARD AS NAILS TO FORMAT RIGHT - THESE ARE HACKS
+# Table is not a root element or base case, but we render it like one:
+# cells are laid out as plain text
+@register("table")
+def render_table_element(table, render_info):
+    return (render_table(table, render_info),)
 
 
 def render_table_helper(row_head_data, body_data, render_info):
-    row_head_lengths = [len(x) for x in row_head_data]
-    max_lengths = []
-    for row_elems in range(0, len(body_data[0])):
-        max_lengths.append(
-            max(len(body_data[rows][row_elems]) for rows in range(0, len(body_data)))
-        )
-    maximum_lengths = []
-    for i in range(0, len(row_head_lengths)):
-        max_length = (
-            max_lengths[i]
-            if max_lengths[i] > row_head_lengths[i]
-            else row_head_lengths[i]
-        )
-        maximum_lengths.append(max_length)
-    print_table_format_line(maximum_lengths, render_info)
-    print_table_data_line(maximum_lengths, row_head_data, render_info)
-    print_table_format_line(maximum_lengths, render_info)
-    for row in body_data:
-        print_table_data_line(maximum_lengths, row, render_info)
-    print_table_format_line(maximum_lengths, render_info)
-
-
-def print_table_format_line(maximum_lengths, render_info):
-    eprint(colored("+", "yellow"))
-    for length in maximum_lengths:
-        eprint(colored("-", "yellow"))
-        eprint(colored("-" * length, "yellow"))
-        eprint(colored("-+", "yellow"))
-    eprint(colored("\n", "yellow"))
-
-
-def print_table_data_line(maximum_lengths, row_head_data, render_info):
-    eprint(colored("|", "yellow"))
-    for i in range(0, len(row_head_data)):
-        eprint(colored(" ", "yellow"))
-        padding_amount = maximum_lengths[i] - len(row_head_data[i])
-        padding = ""
-        padding += " " * padding_amount
-        eprint(colored(row_head_data[i] + padding, "yellow"))
-        eprint(colored(" |", "yellow"))
-    eprint(colored("\n", "yellow"))
+    return TableBlock(
+        row_head_data,
+        body_data,
+        table_widths(row_head_data, body_data),
+        render_info.frame,
+    )
 
 
-# TABLES AND IMAGES ARE HARD AS NAILS TO FORMAT RIGHT - THESE ARE HACKS
-def element_renderer(elem, render_info):
-    # Base case - all that's left is text
-    if elem.name is None:
-        return render_info.render_root_text(elem)
-    # RECURSIVE CASES - THIS IS A DOOZY
-    # Table is not a root element or base case, but we render it like one
-    # for now because formatting tables is a royal pain in the @$$
-    elif elem.name == "table":
-        render_table(elem, render_info)
-        return []  # THIS IS A HACK
-    elif elem.name == "img" or elem.name == "svg":
-        # Come back to image rendering later
-        return []
-    elif elem.name == "ol" or elem.name == "ul" or elem.name == "nav":
-        return render_list(elem, render_info)
-    elif (
-        elem.name == "div"
-        or elem.name == "center"
-        or elem.name == "header"
-        or elem.name == "footer"
-        or elem.name == "main"
-    ):
-        return render_div(elem, render_info)
-    elif elem.name == "span":
-        return render_span(elem, render_info)
-    elif elem.name == "sub":
-        return render_subscript(elem, render_info)
-    elif elem.name == "sup":
-        return render_superscript(elem, render_info)
-    elif elem.name == "em" or elem.name == "i":
-        r = deepcopy(render_info)
-        r.attrs += ["bold"]
-        return [element_renderer(x, r) for x in elem.contents]
-    elif elem.name == "strong" or elem.name == "b":
-        r = deepcopy(render_info)
-        r.attrs += ["underline"]
-        return [element_renderer(x, r) for x in elem.contents]
-    elif elem.name == "hr":
-        return render_horizontal_line(render_info)
-    elif elem.name == "code":
-        r = deepcopy(render_info)
-        r.color = "grey"
-        return [element_renderer(x, r) for x in elem.contents]
-    elif elem.name == "p" or elem.name == "button" or elem.name == "noscript":
-        r = deepcopy(render_info)
-        r.attrs = []
-        return [element_renderer(x, r) for x in elem.contents]
-    elif elem.name == "label":
-        r = deepcopy(render_info)
-        r.colr = "blue"
-        r.attrs = ["underline"]
-        return [element_renderer(x, r) for x in elem.contents]
-    elif elem.name == "li":
-        r = deepcopy(render_info)
-        r.attrs = []
-        r.color = "magenta"
-        return [element_renderer(x, r) for x in elem.contents]
-    elif elem.name == "a":
-        return render_link(elem, render_info)
-    elif elem.name == "blockquote":
-        r = deepcopy(render_info)
-        r.attrs = []
-        r.color = "cyan"
-        return [element_renderer(x, r) for x in elem.contents]
-    elif elem.name in ["h1", "h2", "h3", "h4", "h5", "h6"]:
-        r = deepcopy(render_info)
-        r.attrs += ["reverse"]
-        r.color = "red"
-        return [element_renderer(x, r) for x in elem.contents]
-    elif elem.name == "script":
-        render_script(elem, render_info)
-    elif (
-        elem.name == "ins"
-        or elem.name == "br"
-        or elem.name == "wbr"
-        or elem.name == "style"
-        or elem.name == "input"
-        or elem.name == "form"
-    ):
-        return []  # Will be flattened out
-    else:
-        raise NotImplementedError(f"{elem.name} not implemented yet")
+# What one element turns into: the nodes it renders to directly, or a Descend
+# into its children. Both traversal engines below drive this. With --timings
+# on, each call is counted and timed under its tag.
+def element_step(elem, render_info):
+    name = TEXT if elem.name is None else elem.name
+    renderer = RENDERERS.get(name, fallback)
+    if not instrument.active.enabled:
+        return renderer(elem, render_info)
+    started = time.perf_counter()
+    try:
+        return renderer(elem, render_info)
+    finally:
+        instrument.active.rendered(name, time.perf_counter() - started)
+
+
+# Walks the tree with an explicit stack instead of the call stack, so depth
+# is only limited by memory: one stack entry and one frame per open element.
+# Nodes produced inside a div go into its Block, which is emitted (or added
+# to the enclosing Block) once the div is done. With `stream`, Blocks are
+# emitted (or added) as soon as they open and marked complete once done, and
+# None is yielded after each node added inside one, so the caller can lay
+# out the start of a page before the rest of it is rendered.
+def element_renderer(elem, render_info, stream=False):
+    base = len(render_info.frames)
+    stack = []
+    blocks = []
+    step = element_step(elem, render_info)
+    try:
+        while True:
+            if type(step) is Descend:
+                block = None
+                if step.title is not None:
+                    block = Block(step.title, render_info.div_depth, [], not stream)
+                    if stream:
+                        if blocks:
+                            blocks[-1].children.append(block)
+                        else:
+                            yield block
+                    blocks.append(block)
+                render_info.push(**step.overrides)
+                stack.append((iter(step.children), block))
+            elif blocks:
+                blocks[-1].children.extend(step)
+                if stream:
+                    yield None
+            else:
+                yield from step
+            child = None
+            while stack:
+                children, block = stack[-1]
+                child = next(children, None)
+                if child is not None:
+                    break
+                stack.pop()
+                render_info.pop()
+                if block is None:
+                    continue
+                blocks.pop()
+                if stream:
+                    block.complete = True
+                elif blocks:
+                    blocks[-1].children.append(block)
+                else:
+                    yield block
+            if child is None:
+                return
+            step = element_step(child, render_info)
+    finally:
+        del render_info.frames[base:]
+
+
+# The same rendering on the call stack, one nested generator per level. Kept
+# as the reference the explicit-stack walk is tested and benchmarked against.
+def recursive_element_renderer(elem, render_info):
+    step = element_step(elem, render_info)
+    if type(step) is not Descend:
+        yield from step
+        return
+    depth = render_info.div_depth
+    with render_info.push(**step.overrides):
+        nodes = (
+            node
+            for x in step.children
+            for node in recursive_element_renderer(x, render_info)
+        )
+        if step.title is None:
+            yield from nodes
+            return
+        children = list(nodes)
+    yield Block(step.title, depth, children)
@@ -0,0 +1,227 @@
+import math
+import os
+import re
+import sqlite3
+from array import array
+from collections import Counter
+from typing import Dict, List, NamedTuple
+
+from .constants import FAMILIES
+from .parsing import DEFAULT_PARSER
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+SEPARATOR_RE = re.compile(r"[\s_]+")
+MMAP_SIZE = 64 * 1024 * 1024
+NAME_WEIGHT = 8.0
+TITLE_WEIGHT = 3
+FUZZY_THRESHOLD = 0.5
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+SCHEMA = """
+CREATE TABLE docs (
+    id INTEGER PRIMARY KEY,
+    family TEXT NOT NULL,
+    name TEXT NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE TABLE terms (term TEXT PRIMARY KEY, postings BLOB NOT NULL) WITHOUT ROWID;
+CREATE TABLE grams (gram TEXT PRIMARY KEY, docs BLOB NOT NULL) WITHOUT ROWID;
+CREATE TABLE meta (key TEXT PRIMARY KEY, value REAL NOT NULL) WITHOUT ROWID;
+"""
+
+
+class Hit(NamedTuple):
+    family: str
+    name: str
+    score: float
+
+    @property
+    def url(self):
+        return FAMILIES[self.family] + self.name
+
+
+def index_path(mirror_path):
+    return os.path.splitext(mirror_path)[0] + ".index.sqlite3"
+
+
+def normalize_name(name):
+    return SEPARATOR_RE.sub("-", name.strip().lower())
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def trigrams(name):
+    padded = f"${normalize_name(name)}$"
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+# Postings are packed as flat (doc, term frequency) arrays of unsigned ints
+# and trigram lists as doc id arrays, one row per term or gram.
+def build_index(mirror, path, parser=DEFAULT_PARSER):
+    from bs4 import BeautifulSoup  # type: ignore
+
+    if os.path.exists(path):
+        os.remove(path)
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    postings: Dict[str, array] = {}
+    grams: Dict[str, array] = {}
+    total_length = 0
+    doc_id = 0
+    for family, name, _, html in mirror.pages():
+        if not name:
+            continue
+        doc_id += 1
+        text = BeautifulSoup(html, parser).get_text(" ")
+        counts = Counter(tokenize(text))
+        for token in tokenize(name.replace("-", " ")):
+            counts[token] += TITLE_WEIGHT
+        length = sum(counts.values())
+        total_length += length
+        db.execute(
+            "INSERT INTO docs VALUES (?, ?, ?, ?)", (doc_id, family, name, length)
+        )
+        for term, tf in counts.items():
+            postings.setdefault(term, array("I")).extend((doc_id, tf))
+        for gram in trigrams(name):
+            grams.setdefault(gram, array("I")).append(doc_id)
+    db.executemany(
+        "INSERT INTO terms VALUES (?, ?)",
+        ((term, docs.tobytes()) for term, docs in postings.items()),
+    )
+    db.executemany(
+        "INSERT INTO grams VALUES (?, ?)",
+        ((gram, docs.tobytes()) for gram, docs in grams.items()),
+    )
+    db.executemany(
+        "INSERT INTO meta VALUES (?, ?)",
+        (("docs", doc_id), ("avg_length", total_length / max(doc_id, 1))),
+    )
+    db.commit()
+    db.execute("VACUUM")
+    db.close()
+    return doc_id
+
+
+def unpack(blob):
+    docs = array("I")
+    docs.frombytes(blob)
+    return docs
+
+
+# Nothing is read from disk until the first query, and SQLite memory-maps the
+# file so repeated lookups only touch the pages they need.
+class SearchIndex:
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+
+    @classmethod
+    def open(cls, path):
+        return cls(path) if os.path.exists(path) else None
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._db.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,))
+        return row.fetchone()[0]
+
+    def docs(self, doc_ids):
+        placeholders = ",".join("?" * len(doc_ids))
+        rows = self.db.execute(
+            f"SELECT id, family, name, length FROM docs WHERE id IN ({placeholders})",
+            list(doc_ids),
+        )
+        return {doc_id: (family, name, length) for doc_id, family, name, length in rows}
+
+    def name_matches(self, query, family=None):
+        grams = trigrams(query)
+        placeholders = ",".join("?" * len(grams))
+        rows = self.db.execute(
+            f"SELECT docs FROM grams WHERE gram IN ({placeholders})", list(grams)
+        )
+        candidates = set()
+        for (blob,) in rows:
+            candidates.update(unpack(blob))
+        if not candidates:
+            return {}
+        scores = {}
+        for doc_id, (doc_family, name, _) in self.docs(candidates).items():
+            if family is None or doc_family == family:
+                scores[doc_id] = similarity(grams, trigrams(name))
+        return scores
+
+    def search(self, query, limit=10) -> List[Hit]:
+        scores: Counter = Counter()
+        terms = set(tokenize(query))
+        if terms:
+            placeholders = ",".join("?" * len(terms))
+            rows = self.db.execute(
+                f"SELECT postings FROM terms WHERE term IN ({placeholders})",
+                list(terms),
+            ).fetchall()
+            total_docs = self.meta("docs")
+            avg_length = self.meta("avg_length")
+            matches = [unpack(blob) for (blob,) in rows]
+            lengths = self.docs({doc for m in matches for doc in m[::2]})
+            for docs in matches:
+                df = len(docs) // 2
+                idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+                for doc_id, tf in zip(docs[::2], docs[1::2]):
+                    norm = 1 - BM25_B + BM25_B * lengths[doc_id][2] / avg_length
+                    scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+        for doc_id, score in self.name_matches(query).items():
+            scores[doc_id] += NAME_WEIGHT * score
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        docs = self.docs([doc_id for doc_id, _ in ranked]) if ranked else {}
+        return [Hit(docs[d][0], docs[d][1], score) for d, score in ranked]
+
+    def exists(self, family, name):
+        row = self.db.execute(
+            "SELECT 1 FROM docs WHERE family = ? AND name = ?", (family, name)
+        )
+        return row.fetchone() is not None
+
+    # A name the index has is used as is; only other names are corrected to
+    # the closest one, and only when it is close enough
+    def resolve(self, family, name):
+        if self.exists(family, normalize_name(name)):
+            return normalize_name(name)
+        scores = self.name_matches(name, family)
+        if not scores:
+            return None
+        doc_id = max(scores, key=lambda d: (scores[d], -d))
+        if scores[doc_id] < FUZZY_THRESHOLD:
+            return None
+        return self.docs([doc_id])[doc_id][1]
+
+
+def run_search(args):
+    index = SearchIndex.open(index_path(args.mirror))
+    if index is None:
+        print("No search index yet - run `itbrowz mirror` to build one")
+        return 1
+    hits = index.search(args.search)
+    index.close()
+    for hit in hits:
+        print(f"{hit.family:<6} {hit.name:<32} {hit.url}")
+    return 0
@@ -0,0 +1,32 @@
+from typing import Dict, Tuple
+
+Style = Tuple[str, str]
+
+
+# Escape sequences for every (color, attrs) pair are built once through
+# termcolor and then reused, so painting a fragment is two concatenations.
+# With color disabled the table hands text back untouched.
+class StyleTable:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.styles: Dict[Tuple[str, Tuple[str, ...]], Style] = {}
+
+    def style(self, color, attrs=()):
+        key = (color, attrs)
+        style = self.styles.get(key)
+        if style is None:
+            from termcolor import RESET, colored
+
+            sample = colored("", color, attrs=attrs)
+            if sample.endswith(RESET):
+                style = (sample[: -len(RESET)], RESET)
+            else:
+                style = ("", "")
+            self.styles[key] = style
+        return style
+
+    def paint(self, text, color, attrs=()):
+        if not self.enabled:
+            return text
+        opening, reset = self.style(color, attrs)
+        return opening + text + reset
@@ -0,0 +1,25 @@
+from typing import NamedTuple
+
+TARGET_KINDS = ("spell", "class", "race", "url")
+
+
+class Target(NamedTuple):
+    kind: str
+    name: str
+
+
+# One target per line, either "<kind> <name>" or a bare URL. Blank lines and
+# lines starting with # are skipped.
+def read_targets(path):
+    targets = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            kind, _, name = line.partition(" ")
+            if kind in TARGET_KINDS and name.strip():
+                targets.append(Target(kind, name.strip()))
+            else:
+                targets.append(Target("url", line))
+    return targets
@@ -0,0 +1,133 @@
+import unicodedata
+from bisect import bisect_right
+from itertools import accumulate
+from typing import List
+
+from .constants import UNICODE_MAP
+
+SUPERSCRIPT = str.maketrans(
+    {char: pair[0] for char, pair in UNICODE_MAP.items() if pair[0] != "?"}
+)
+SUBSCRIPT = str.maketrans(
+    {char: pair[1] for char, pair in UNICODE_MAP.items() if pair[1] != "?"}
+)
+WHITESPACE = str.maketrans({"\t": " ", "\v": " ", "\f": " ", "\r": None})
+
+
+# Tabs and the rarer blanks become plain spaces, carriage returns go away.
+# Most text has none of them, which is cheaper to check than to translate.
+def normalize_whitespace(text: str) -> str:
+    if "\t" in text or "\r" in text or "\v" in text or "\f" in text:
+        return text.translate(WHITESPACE)
+    return text
+
+
+def superscript_translate(s):
+    return s.translate(SUPERSCRIPT)
+
+
+def subscript_translate(s):
+    return s.translate(SUBSCRIPT)
+
+
+# Columns a character takes up in the terminal: none for combining marks
+# and format characters, two for East Asian wide ones (CJK, most emoji)
+def char_width(char):
+    if unicodedata.combining(char) or unicodedata.category(char) in ("Mn", "Me", "Cf"):
+        return 0
+    if unicodedata.east_asian_width(char) in ("W", "F"):
+        return 2
+    return 1
+
+
+# Each character is looked up in unicodedata once, then remembered
+class WidthTable(dict):
+    def __missing__(self, char):
+        width = self[char] = char_width(char)
+        return width
+
+
+WIDTHS = WidthTable()
+
+
+def display_width(text: str) -> int:
+    if text.isascii():
+        return len(text)
+    return sum(map(WIDTHS.__getitem__, text))
+
+
+# How many characters from the start of `text` fit in `columns` columns
+def fit_columns(text: str, columns: int) -> int:
+    if text.isascii():
+        return min(len(text), columns)
+    widths = accumulate(map(WIDTHS.__getitem__, text[:columns]))
+    return bisect_right(list(widths), columns)
+
+
+# Greedy word wrap of one line, breaking at the last space that fits and
+# splitting words that are wider than a whole line. A line that fits comes
+# back as is, spaces and all.
+def wrap_line(line: str, width: int) -> List[str]:
+    if not line.isascii():
+        return wrap_wide(line, width)
+    if len(line) <= width:
+        return [line]
+    return wrap_narrow(line, width)
+
+
+# ASCII is one column a character, so string positions are columns
+def wrap_narrow(line: str, width: int) -> List[str]:
+    lines: List[str] = []
+    append = lines.append
+    find = line.rfind
+    start = 0
+    last = len(line) - width
+    while start < last:
+        cut = find(" ", start, start + width + 1)
+        if cut > start:
+            append(line[start:cut])
+            start = cut + 1
+        else:
+            append(line[start : start + width])
+            start += width
+    if start < len(line):
+        append(line[start:])
+    return lines
+
+
+# A line never holds more than `width` characters, so running column counts
+# over that many tell how much fits; the break is the last space in there
+def wrap_wide(line: str, width: int) -> List[str]:
+    lines: List[str] = []
+    start = 0
+    while True:
+        window = line[start : start + width + 1]
+        if window.isascii():
+            fit = min(len(window), width)
+        else:
+            columns = accumulate(map(WIDTHS.__getitem__, window))
+            fit = bisect_right(list(columns), width)
+        if start + fit >= len(line):
+            break
+        cut = line.rfind(" ", start, start + fit + 1)
+        if cut > start:
+            lines.append(line[start:cut])
+            start = cut + 1
+        else:
+            # Whatever fits of a long word, or one wide character at least
+            fit = max(fit, 1)
+            lines.append(line[start : start + fit])
+            start += fit
+    if start < len(line) or not lines:
+        lines.append(line[start:])
+    return lines
+
+
+# Splits text into terminal lines at most `width` columns wide. Blank lines
+# produce nothing, as the text between block elements is mostly newlines.
+def wrap_text(text: str, width: int) -> List[str]:
+    lines: List[str] = []
+    for line in normalize_whitespace(text).split("\n"):
+        if line:
+            lines.extend(wrap_line(line, width))
+    return lines
@@ -1,10 +1,3 @@
-from .constants import UNICODE_MAP
-
-
-def eprint(arg):
-    print(arg, end="")
-
-
 def deep_flatten(nested_list):
     if nested_list is None:
         return []
@@ -21,24 +14,6 @@ def deep_flatten(nested_list):
         return flattened
 
 
-def superscript_translate(s):
-    ret = ""
-    for letter in s:
-        translated = UNICODE_MAP[letter][0]
-        let = letter if translated == "?" else translated
-        ret.append(let)
-    return ret
-
-
-def subscript_translate(s):
-    ret = ""
-    for letter in s:
-        translated = UNICODE_MAP[letter][1]
-        let = letter if translated == "?" else translated
-        ret.append(let)
-    return ret
-
-
 def get_elem_link_attr(elem, render_info, link_attr):
     try:
         attr = elem[link_attr]
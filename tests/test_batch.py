@@ -0,0 +1,95 @@
+import io
+from types import SimpleNamespace
+
+from itbrowz.batch import run_batch, run_stream
+from itbrowz.fetch import Fetcher
+from itbrowz.itbrowz import Target
+from itbrowz.targets import read_targets
+
+SOME_PAGE = '<html><body><p>{}</p><a href="/{}">link</a></body></html>'
+
+
+def batch_args(tmp_path, **overrides):
+    args = dict(
+        div="",
+        no_color=True,
+        images=False,
+        offline=False,
+        mirror=str(tmp_path / "missing.sqlite3"),
+        jobs=2,
+        output_dir=str(tmp_path / "out"),
+    )
+    args.update(overrides)
+    return SimpleNamespace(**args)
+
+
+def test_read_targets__kinds_and_bare_urls(tmp_path):
+    path = tmp_path / "targets.txt"
+    path.write_text("# prep\nspell fireball\n\nhttps://5thsrd.org/\nrace half-elf\n")
+
+    targets = read_targets(str(path))
+
+    assert targets == [
+        Target("spell", "fireball"),
+        Target("url", "https://5thsrd.org/"),
+        Target("race", "half-elf"),
+    ]
+
+
+def test_run_batch__output_dir__one_file_per_target_in_order(fixture_server, tmp_path):
+    fixture_server.pages = {
+        "/a.html": SOME_PAGE.format("first", "x").encode(),
+        "/b.html": SOME_PAGE.format("second", "y").encode(),
+    }
+    targets = [
+        Target("url", fixture_server.url + "/a.html"),
+        Target("url", fixture_server.url + "/b.html"),
+    ]
+
+    status = run_batch(targets, batch_args(tmp_path), fetcher=Fetcher())
+
+    outputs = sorted((tmp_path / "out").iterdir())
+    assert status == 0
+    assert [p.name for p in outputs] == [
+        "001-url-http_127.0.0.1_{}_a.html".format(fixture_server.server_address[1])
+        + ".txt",
+        "002-url-http_127.0.0.1_{}_b.html".format(fixture_server.server_address[1])
+        + ".txt",
+    ]
+    assert "first" in outputs[0].read_text()
+    assert "second" in outputs[1].read_text()
+    assert "1: [" in outputs[1].read_text()
+
+
+def test_run_batch__missing_page__reports_failure_and_continues(
+    fixture_server, tmp_path
+):
+    fixture_server.pages = {"/a.html": SOME_PAGE.format("first", "x").encode()}
+    targets = [
+        Target("url", fixture_server.url + "/missing.html"),
+        Target("url", fixture_server.url + "/a.html"),
+    ]
+
+    status = run_batch(targets, batch_args(tmp_path), fetcher=Fetcher())
+
+    assert status == 1
+    assert len(list((tmp_path / "out").iterdir())) == 1
+
+
+def test_run_stream__same_output_as_batch(fixture_server, tmp_path):
+    fixture_server.pages = {
+        "/a.html": SOME_PAGE.format("first", "x").encode(),
+        "/b.html": SOME_PAGE.format("second", "y").encode(),
+    }
+    targets = [
+        Target("url", fixture_server.url + "/a.html"),
+        Target("url", fixture_server.url + "/b.html"),
+    ]
+    batched, streamed = io.StringIO(), io.StringIO()
+    args = batch_args(tmp_path, output_dir="")
+    run_batch(targets, args, batched, fetcher=Fetcher())
+
+    status = run_stream(targets, args, streamed, fetcher=Fetcher())
+
+    assert status == 0
+    assert streamed.getvalue() == batched.getvalue()
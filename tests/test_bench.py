@@ -0,0 +1,56 @@
+from itbrowz.bench.runner import compare, run
+from itbrowz.bench.startup import check_client, check_startup, startup_times
+from itbrowz.fetch import DiskCache
+
+
+def test_compare__slower_than_threshold__flagged():
+    baseline = {"results": {"a": {"median": 1.0}, "b": {"median": 1.0}}}
+    current = {"results": {"a": {"median": 1.1}, "b": {"median": 1.5}}}
+
+    regressions = compare(current, baseline, threshold=0.25)
+
+    assert regressions == {"b": 1.5}
+
+
+def test_run__selected_cases__timed_once_each():
+    results = run(repeat=1, select="deep_flatten")
+
+    assert sorted(results["results"]) == [
+        "deep_flatten/depth-10",
+        "deep_flatten/depth-100",
+    ]
+    assert results["results"]["deep_flatten/depth-10"]["runs"] == 1
+
+
+def test_check_startup__cli_entry_point__no_heavy_imports():
+    _, heavy = check_startup()
+
+    assert heavy == []
+
+
+def test_check_client__client_lookup__renderer_and_heavy_modules_not_imported():
+    assert check_client() == []
+
+
+def test_startup_times__one_run__cli_and_baseline_measured():
+    elapsed, baseline = startup_times(runs=1)
+
+    assert elapsed > 0 and baseline > 0
+
+
+def test_check_startup__offline_cached_lookup__requests_not_imported(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    cache.put("https://example.com/", b"<body><p>cached</p></body>", None, None)
+    code = (
+        "from types import SimpleNamespace\n"
+        "from itbrowz.fetch import DiskCache, Fetcher\n"
+        "from itbrowz.itbrowz import arbitrary_url_lookup\n"
+        f"fetcher = Fetcher(DiskCache({str(tmp_path)!r}), offline=True)\n"
+        "args = SimpleNamespace(url='https://example.com/', div='',"
+        " no_color=True, images=False, offline=True, mirror='/nonexistent')\n"
+        "arbitrary_url_lookup(args, fetcher=fetcher)\n"
+    )
+
+    _, heavy = check_startup(code)
+
+    assert "requests" not in heavy
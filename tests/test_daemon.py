@@ -0,0 +1,117 @@
+import io
+import os
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from itbrowz.client import run_client
+from itbrowz.daemon import Daemon, DaemonServer, LRUCache
+from itbrowz.fetch import Fetcher
+from itbrowz.itbrowz import Target, arbitrary_url_lookup
+from itbrowz.output import OutputSink
+
+SOME_PAGE = b'<html><body><p>warm</p><a href="/next">link</a></body></html>'
+
+
+def daemon_args(tmp_path, **overrides):
+    args = dict(
+        div="",
+        no_color=True,
+        images=False,
+        offline=False,
+        mirror=str(tmp_path / "missing.sqlite3"),
+        socket=str(tmp_path / "itbrowz.sock"),
+    )
+    args.update(overrides)
+    return SimpleNamespace(**args)
+
+
+@pytest.fixture()
+def daemon_server(tmp_path):
+    args = daemon_args(tmp_path)
+    server = DaemonServer(args.socket, Daemon(args, fetcher=Fetcher()))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_run_client__repeated_lookup__matches_direct_render_and_fetches_once(
+    daemon_server, fixture_server, tmp_path, mocker
+):
+    fixture_server.pages = {"/page.html": SOME_PAGE}
+    url = fixture_server.url + "/page.html"
+    args = daemon_args(tmp_path, url=url)
+    mocker.patch("shutil.get_terminal_size", return_value=os.terminal_size((60, 24)))
+    direct = io.StringIO()
+    arbitrary_url_lookup(args, OutputSink(direct), Fetcher())
+    fixture_server.requests = []
+
+    outputs = []
+    for _ in range(2):
+        stdout = io.BytesIO()
+        status = run_client([Target("url", url)], args, stdout, io.BytesIO())
+        outputs.append(stdout.getvalue().decode("utf-8"))
+
+    assert status == 0
+    assert outputs == [direct.getvalue()] * 2
+    assert fixture_server.requests == ["/page.html"]
+    assert len(daemon_server.daemon.rendered) == 1
+
+
+def test_run_client__offline_lookup_not_cached__error_and_status_returned(
+    daemon_server, fixture_server, tmp_path
+):
+    args = daemon_args(tmp_path, offline=True)
+    stderr = io.BytesIO()
+
+    status = run_client(
+        [Target("url", fixture_server.url + "/gone.html")], args, io.BytesIO(), stderr
+    )
+
+    assert status == 1
+    assert b"not cached" in stderr.getvalue()
+
+
+def test_run_client__unexpected_error__reported_and_rest_still_sent(
+    daemon_server, fixture_server, tmp_path, mocker
+):
+    fixture_server.pages = {"/page.html": SOME_PAGE}
+    render = daemon_server.daemon.render
+
+    def broken_render(target, *rest):
+        if target.name.endswith("/x.html"):
+            raise RuntimeError("layout broke")
+        return render(target, *rest)
+
+    mocker.patch.object(daemon_server.daemon, "render", side_effect=broken_render)
+    args = daemon_args(tmp_path)
+    targets = [Target("url", fixture_server.url + f"/{p}.html") for p in ("x", "page")]
+    stdout, stderr = io.BytesIO(), io.BytesIO()
+
+    status = run_client(targets, args, stdout, stderr)
+
+    assert status == 1
+    assert b"layout broke" in stderr.getvalue()
+    assert b"warm" in stdout.getvalue()
+
+
+def test_run_client__no_daemon__returns_error(tmp_path):
+    args = daemon_args(tmp_path)
+
+    status = run_client([Target("spell", "light")], args, io.BytesIO(), io.BytesIO())
+
+    assert status == 1
+
+
+def test_lru_cache__over_capacity__least_recently_used_dropped():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+
+    cache.put("c", 3)
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
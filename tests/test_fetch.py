@@ -0,0 +1,103 @@
+import tracemalloc
+
+import pytest
+
+from itbrowz.fetch import BadResponseError, DiskCache, Fetcher, NotCachedError
+
+SOME_URL = "https://5thsrd.org/spellcasting/spells/fireball/"
+SOME_HTML = {"Content-Type": "text/html"}
+
+
+def test_fetcher__cached_etag__revalidates_and_serves_cache_on_304(
+    request_mock, tmp_path
+):
+    fetcher = Fetcher(cache=DiskCache(str(tmp_path)))
+    request_mock.get(SOME_URL, content=b"<html>v1</html>", headers={"ETag": '"v1"'})
+    fetcher.get(SOME_URL)
+    request_mock.get(SOME_URL, status_code=304)
+
+    content = fetcher.get(SOME_URL)
+
+    assert content == b"<html>v1</html>"
+    assert request_mock.last_request.headers["If-None-Match"] == '"v1"'
+
+
+def test_fetcher__offline_and_not_cached__raises(request_mock, tmp_path):
+    fetcher = Fetcher(cache=DiskCache(str(tmp_path)), offline=True)
+
+    with pytest.raises(NotCachedError):
+        fetcher.get(SOME_URL)
+
+    assert not request_mock.called
+
+
+def test_disk_cache__over_max_size__evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_size=10)
+    cache.put("https://a/", b"123456")
+    cache.put("https://b/", b"123456")
+
+    assert cache.get("https://a/") is None
+    assert cache.get("https://b/").body == b"123456"
+
+
+def test_fetcher__stream__yields_body_and_caches_it(request_mock, tmp_path):
+    fetcher = Fetcher(cache=DiskCache(str(tmp_path)))
+    request_mock.get(SOME_URL, content=b"<html>v1</html>", headers={"ETag": '"v1"'})
+
+    chunks = list(fetcher.stream(SOME_URL, chunk_size=4))
+
+    assert b"".join(chunks) == b"<html>v1</html>"
+    assert len(chunks) > 1
+    assert fetcher.cache.get(SOME_URL).etag == '"v1"'
+
+
+def test_fetcher__wrong_content_type__raises_and_not_cached(request_mock, tmp_path):
+    fetcher = Fetcher(cache=DiskCache(str(tmp_path)))
+    request_mock.get(SOME_URL, content=b"<html></html>", headers=SOME_HTML)
+
+    with pytest.raises(BadResponseError):
+        fetcher.get(SOME_URL, content_type="image/")
+
+    assert fetcher.cache.get(SOME_URL) is None
+
+
+def test_fetcher__stream_error_status__raises_before_any_chunk(request_mock, tmp_path):
+    fetcher = Fetcher(cache=DiskCache(str(tmp_path)))
+    request_mock.get(SOME_URL, status_code=404, content=b"<html>gone</html>")
+    chunks = fetcher.stream(SOME_URL)
+
+    with pytest.raises(BadResponseError):
+        next(chunks)
+
+    assert fetcher.cache.get(SOME_URL) is None
+
+
+def test_disk_cache__read_order_against_hash_order__least_recently_read_evicted(
+    tmp_path,
+):
+    cache = DiskCache(str(tmp_path), max_size=12)
+    urls = sorted(
+        (f"https://5thsrd.org/{n}/" for n in range(3)),
+        key=lambda url: cache.path(url, ""),
+    )
+    for url in urls:
+        cache.put(url, b"1234")
+    for url in reversed(urls):
+        cache.get(url)
+
+    cache.put("https://5thsrd.org/new/", b"1234")
+
+    assert [cache.get(url) is None for url in urls] == [False, False, True]
+
+
+def test_fetcher__stream_without_cache__body_not_held(request_mock):
+    body = b"x" * (4 * 1024 * 1024)
+    request_mock.get(SOME_URL, content=body)
+    tracemalloc.start()
+
+    size = sum(len(chunk) for chunk in Fetcher().stream(SOME_URL))
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert size == len(body)
+    assert peak < 1024 * 1024
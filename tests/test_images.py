@@ -0,0 +1,152 @@
+import base64
+import io
+import struct
+import zlib
+
+import pytest
+
+from itbrowz.fetch import DiskCache, Fetcher
+from itbrowz.images import CELL_PIXELS, ImageLoader, shrink
+from itbrowz.itbrowz import (
+    TerminalRenderData,
+    build_document,
+    render_document,
+    render_html,
+)
+from itbrowz.output import OutputSink
+from itbrowz.parsing import BODY, parse_root
+from itbrowz.styles import StyleTable
+
+
+# A real black PNG, built without Pillow so tests run with or without it
+def some_png(width, height):
+    def chunk(kind, data):
+        crc = zlib.crc32(kind + data)
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", crc)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    rows = (b"\x00" + b"\x00\x00\x00" * width) * height
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+SOME_IMAGE = some_png(4, 4)
+SOME_PAGE = (
+    b"<html><body><p>before</p><img src='a.png'><div><img src='b/c.png'></div>"
+    b"<img src='a.png'><p>after</p></body></html>"
+)
+
+
+def page_elements():
+    return parse_root(SOME_PAGE, BODY, "html.parser").root.contents
+
+
+def render(base_url, images):
+    out = io.StringIO()
+    render_html(
+        page_elements(), base_url, OutputSink(out), StyleTable(False), 80, images
+    )
+    return out.getvalue()
+
+
+def test_build_document__images__all_requested_before_layout(fixture_server, tmp_path):
+    fixture_server.pages = {"/pages/a.png": SOME_IMAGE, "/pages/b/c.png": SOME_IMAGE}
+    base_url = fixture_server.url + "/pages/"
+    loader = ImageLoader(Fetcher(), DiskCache(str(tmp_path)))
+    render_info = TerminalRenderData(base_url, width=80, images=loader)
+
+    document = build_document(page_elements(), render_info)
+
+    assert sorted(url for url, _ in loader.pending) == [
+        fixture_server.url + "/pages/a.png",
+        fixture_server.url + "/pages/b/c.png",
+    ]
+    out = io.StringIO()
+    render_document(document, OutputSink(out), render_info.styles, 80, loader)
+    assert out.getvalue().count(base64.b64encode(SOME_IMAGE).decode()) == 3
+    loader.close()
+
+
+def test_render_html__images_seen_before__served_from_cache(fixture_server, tmp_path):
+    fixture_server.pages = {"/pages/a.png": SOME_IMAGE, "/pages/b/c.png": SOME_IMAGE}
+    base_url = fixture_server.url + "/pages/"
+    with ImageLoader(Fetcher(), DiskCache(str(tmp_path))) as loader:
+        first = render(base_url, loader)
+    fetched = list(fixture_server.requests)
+
+    with ImageLoader(Fetcher(), DiskCache(str(tmp_path))) as loader:
+        second = render(base_url, loader)
+
+    assert sorted(fetched) == ["/pages/a.png", "/pages/b/c.png"]
+    assert fixture_server.requests == fetched
+    assert second == first
+
+
+def test_render_html__no_image_loader__images_skipped():
+    output = render("https://5thsrd.org/", None)
+
+    assert "1337;File=" not in output
+    assert "before" in output and "after" in output
+
+
+def test_image_loader__error_or_not_an_image__nothing_cached(fixture_server, tmp_path):
+    fixture_server.pages = {"/page.html": SOME_IMAGE}
+    cache = DiskCache(str(tmp_path))
+
+    with ImageLoader(Fetcher(), cache) as loader:
+        missing = loader.get(fixture_server.url + "/missing.png", 80)
+        not_an_image = loader.get(fixture_server.url + "/page.html", 80)
+
+    assert missing is None and not_an_image is None
+    assert list(tmp_path.iterdir()) == []
+
+
+class BrokenFetcher(Fetcher):
+    def get(self, url, content_type=None):
+        raise ValueError("broken image")
+
+
+def test_render_html__image_fails_to_decode__page_rendered_without_it():
+    with ImageLoader(BrokenFetcher()) as loader:
+        output = render("https://5thsrd.org/", loader)
+
+    assert "1337;File=" not in output
+    assert "before" in output and "after" in output
+
+
+def test_render_html__term_unset__images_still_rendered(
+    fixture_server, tmp_path, monkeypatch
+):
+    monkeypatch.delenv("TERM", raising=False)
+    fixture_server.pages = {"/pages/a.png": SOME_IMAGE, "/pages/b/c.png": SOME_IMAGE}
+
+    with ImageLoader(Fetcher(), DiskCache(str(tmp_path))) as loader:
+        output = render(fixture_server.url + "/pages/", loader)
+
+    assert output.count(base64.b64encode(SOME_IMAGE).decode()) == 3
+
+
+def test_shrink__wider_than_columns__scaled_to_column_width():
+    image_module = pytest.importorskip("PIL.Image")
+
+    data = shrink(some_png(2000, 100), 80)
+
+    with image_module.open(io.BytesIO(data)) as image:
+        assert image.size == (80 * CELL_PIXELS, 100 * 80 * CELL_PIXELS // 2000)
+
+
+def test_shrink__narrower_than_columns__sent_unchanged():
+    pytest.importorskip("PIL.Image")
+
+    assert shrink(SOME_IMAGE, 80) == SOME_IMAGE
+
+
+def test_shrink__decompression_bomb__no_image(monkeypatch):
+    image_module = pytest.importorskip("PIL.Image")
+    monkeypatch.setattr(image_module, "MAX_IMAGE_PIXELS", 10)
+
+    assert shrink(some_png(100, 100), 80) is None
@@ -0,0 +1,83 @@
+import base64
+import io
+import os
+import tracemalloc
+
+import pytest
+
+from itbrowz.fetch import BadResponseError, Fetcher
+from itbrowz.imgcat import encode_chunks, print_image_in_iterm, print_image_url
+from itbrowz.output import OutputSink
+
+SOME_IMAGE = bytes(range(256)) * 41
+
+
+class NullStream:
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+
+def test_encode_chunks__uneven_chunks__same_as_one_shot():
+    chunks = [SOME_IMAGE[i : i + 7] for i in range(0, len(SOME_IMAGE), 7)]
+
+    encoded = "".join(encode_chunks(chunks))
+
+    assert encoded == base64.b64encode(SOME_IMAGE).decode("ascii")
+
+
+def test_print_image_in_iterm__tmux__wrapped_sequence(mocker, tmp_path):
+    mocker.patch.dict(os.environ, {"TERM": "screen-256color"})
+    path = tmp_path / "image.png"
+    path.write_bytes(SOME_IMAGE)
+    stream = io.StringIO()
+
+    print_image_in_iterm(str(path), OutputSink(stream))
+
+    output = stream.getvalue()
+    assert output.startswith("\x1bPtmux;\x1b\x1b]1337;File=name=")
+    assert f";size={len(SOME_IMAGE)};inline=1:" in output
+    assert output.endswith(base64.b64encode(SOME_IMAGE).decode() + "\a\x1b\\\n")
+
+
+def test_print_image_in_iterm__large_file__memory_stays_bounded(mocker, tmp_path):
+    mocker.patch.dict(os.environ, {"TERM": "xterm"})
+    path = tmp_path / "large.png"
+    path.write_bytes(os.urandom(8 * 1024 * 1024))
+
+    tracemalloc.start()
+    print_image_in_iterm(str(path), OutputSink(NullStream()))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert peak < 2 * 1024 * 1024
+
+
+def test_print_image_url__streams_body_into_sequence(mocker, fixture_server):
+    mocker.patch.dict(os.environ, {"TERM": "xterm"})
+    fixture_server.pages = {"/images/owlbear.png": SOME_IMAGE}
+    stream = io.StringIO()
+
+    print_image_url(
+        fixture_server.url + "/images/owlbear.png", OutputSink(stream), Fetcher()
+    )
+
+    name = base64.b64encode(b"owlbear.png").decode()
+    assert stream.getvalue() == (
+        f"\x1b]1337;File=name={name};inline=1:"
+        + base64.b64encode(SOME_IMAGE).decode()
+        + "\a\n"
+    )
+
+
+def test_print_image_url__not_found__raises_before_writing(fixture_server):
+    stream = io.StringIO()
+
+    with pytest.raises(BadResponseError):
+        print_image_url(
+            fixture_server.url + "/images/missing.png", OutputSink(stream), Fetcher()
+        )
+
+    assert stream.getvalue() == ""
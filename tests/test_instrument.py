@@ -0,0 +1,57 @@
+import io
+
+import pytest
+from bs4 import BeautifulSoup  # type: ignore
+
+from itbrowz import instrument
+from itbrowz.itbrowz import render_html
+from itbrowz.output import OutputSink
+
+
+@pytest.fixture
+def instruments():
+    yield instrument.enable()
+    instrument.disable()
+
+
+def test_render_html__timings_enabled__counts_fragments_and_phases(instruments):
+    soup = BeautifulSoup("<p>one <b>two</b></p>", "html.parser")
+    out = OutputSink(io.StringIO())
+
+    render_html(soup.contents, "https://example.com/", out)
+
+    assert instruments.fragments > 0
+    assert instruments.times["render"] > 0
+    assert "output" in instruments.times
+
+
+def test_render_html__timings_enabled__counts_and_times_each_tag(instruments):
+    soup = BeautifulSoup("<p>one <b>two</b> <b>three</b></p>", "html.parser")
+    stream = io.StringIO()
+
+    render_html(soup.contents, "https://example.com/", OutputSink(io.StringIO()))
+    instruments.report(stream)
+
+    assert instruments.render_counts == {"p": 1, "b": 2, "#text": 4}
+    assert set(instruments.render_times) == {"p", "b", "#text"}
+    assert "b=2/" in stream.getvalue()
+
+
+def test_report__after_run__lists_every_phase(instruments):
+    stream = io.StringIO()
+    instruments.fetched(b"12345")
+
+    instruments.report(stream)
+
+    report = stream.getvalue()
+    assert all(phase in report for phase in instrument.PHASES)
+    assert "bytes fetched:     5" in report
+
+
+def test_null_instruments__phase__records_nothing():
+    null = instrument.NullInstruments()
+
+    with null.phase("render"):
+        pass
+
+    assert not hasattr(null, "times")
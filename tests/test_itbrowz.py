@@ -0,0 +1,25 @@
+from itbrowz.itbrowz import TerminalRenderData
+
+SOME_BASE_URL = "https://5thsrd.org/spellcasting/spells/"
+
+
+def test_terminal_render_data__push__overrides_only_inside_scope():
+    render_info = TerminalRenderData(SOME_BASE_URL)
+
+    with render_info.push(color="red", div_depth=render_info.div_depth + 1):
+        inner = (render_info.color, render_info.div_depth)
+
+    assert inner == ("red", 1)
+    assert (render_info.color, render_info.div_depth) == ("green", 0)
+
+
+def test_terminal_render_data__nested_push__inherits_outer_frame():
+    render_info = TerminalRenderData(SOME_BASE_URL)
+
+    with render_info.push(attrs=("bold",)):
+        with render_info.push(color="magenta"):
+            inner = render_info.frame
+
+    assert inner.attrs == ("bold",)
+    assert inner.color == "magenta"
+    assert len(render_info.frames) == 1
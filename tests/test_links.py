@@ -0,0 +1,21 @@
+from itbrowz.links import LinkRegistry
+
+
+def test_link_registry__register_twice__same_number():
+    links = LinkRegistry()
+
+    first = links.register("[https://5thsrd.org/]")
+    links.register("[https://5thsrd.org/other]")
+    again = links.register("[https://5thsrd.org/]")
+
+    assert first == again == 1
+    assert list(links) == [
+        (1, "[https://5thsrd.org/]"),
+        (2, "[https://5thsrd.org/other]"),
+    ]
+
+
+def test_link_registry__unknown_link__number_zero():
+    links = LinkRegistry()
+
+    assert links.number("[https://5thsrd.org/]") == 0
@@ -0,0 +1,35 @@
+import io
+from types import SimpleNamespace
+
+from itbrowz.__main__ import use_color
+
+
+class SomeTerminal(io.StringIO):
+    def isatty(self):
+        return True
+
+
+def color_args(**overrides):
+    args = dict(no_color=False, color=False, output_dir="")
+    args.update(overrides)
+    return SimpleNamespace(**args)
+
+
+def test_use_color__terminal__colored():
+    assert use_color(color_args(), SomeTerminal())
+
+
+def test_use_color__pipe__plain():
+    assert not use_color(color_args(), io.StringIO())
+
+
+def test_use_color__output_dir_from_terminal__plain():
+    assert not use_color(color_args(output_dir="out"), SomeTerminal())
+
+
+def test_use_color__output_dir_with_color__colored():
+    assert use_color(color_args(output_dir="out", color=True), io.StringIO())
+
+
+def test_use_color__no_color_from_terminal__plain():
+    assert not use_color(color_args(no_color=True), SomeTerminal())
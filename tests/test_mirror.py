@@ -0,0 +1,52 @@
+from itbrowz.fetch import DEFAULT_TIMEOUT, Fetcher
+from itbrowz.mirror import Mirror, crawl_family, crawl_page
+
+SPELL_PAGE = """<html><body>
+<div class="navbar"><div class="container">
+<a href="/spellcasting/spells/fireball/">Fireball</a>
+<a href="/spellcasting/spells/light/">Light</a>
+</div></div>
+<div class="container"><h1>{}</h1></div>
+</body></html>"""
+
+
+def serve_spells(server):
+    server.pages = {
+        "/spellcasting/spells/": SPELL_PAGE.format("Spells").encode(),
+        "/spellcasting/spells/fireball/": SPELL_PAGE.format("Fireball").encode(),
+        "/spellcasting/spells/light/": SPELL_PAGE.format("Light").encode(),
+    }
+    return server.url + "/spellcasting/spells/"
+
+
+def test_crawl_family__fixture_site__stores_each_container(fixture_server, tmp_path):
+    base_url = serve_spells(fixture_server)
+    mirror = Mirror(str(tmp_path / "mirror.sqlite3"))
+
+    counts = crawl_family(mirror, "spell", Fetcher().session, 2, base_url)
+
+    assert counts == {200: 3}
+    assert "<h1>Fireball</h1>" in mirror.get(base_url + "fireball")
+    assert mirror.get(base_url + "light") == (
+        '<div class="container"><h1>Light</h1></div>'
+    )
+
+
+def test_crawl_family__recrawl__revalidates_unchanged_pages(fixture_server, tmp_path):
+    base_url = serve_spells(fixture_server)
+    mirror = Mirror(str(tmp_path / "mirror.sqlite3"))
+    crawl_family(mirror, "spell", Fetcher().session, 2, base_url)
+
+    counts = crawl_family(mirror, "spell", Fetcher().session, 2, base_url)
+
+    assert counts == {304: 3}
+    assert len(mirror) == 3
+
+
+def test_crawl_page__any_page__requested_with_timeout(request_mock):
+    url = "https://5thsrd.org/spellcasting/spells/light/"
+    request_mock.get(url, text=SPELL_PAGE.format("Light"))
+
+    crawl_page(Fetcher().session, url, "https://5thsrd.org/spellcasting/spells/", None)
+
+    assert request_mock.last_request.timeout == DEFAULT_TIMEOUT
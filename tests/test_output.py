@@ -0,0 +1,27 @@
+import io
+
+from itbrowz.output import OutputSink
+
+
+def test_output_sink__below_buffer_size__nothing_written_until_flush():
+    stream = io.StringIO()
+    out = OutputSink(stream, buffer_size=16)
+
+    out.write("abc")
+    out.write("def")
+    before_flush = stream.getvalue()
+    out.flush()
+
+    assert before_flush == ""
+    assert stream.getvalue() == "abcdef"
+
+
+def test_output_sink__buffer_size_reached__writes_one_chunk():
+    stream = io.StringIO()
+    out = OutputSink(stream, buffer_size=4)
+
+    out.write("ab")
+    out.write("cd")
+    out.write("e")
+
+    assert stream.getvalue() == "abcd"
@@ -0,0 +1,99 @@
+import io
+
+from bs4 import BeautifulSoup  # type: ignore
+from termcolor import colored
+
+from itbrowz.itbrowz import (
+    StreamedDocument,
+    TerminalRenderData,
+    build_document,
+    render_document,
+)
+from itbrowz.output import OutputSink
+from itbrowz.pager import VirtualDocument, ansi_markup, split_lines
+from itbrowz.styles import StyleTable
+
+SOME_BASE_URL = "https://5thsrd.org/spellcasting/spells/"
+
+
+def some_html(paragraphs):
+    return "".join(
+        f'<p>paragraph {i} <a href="/{i}">link {i}</a></p>' for i in range(paragraphs)
+    )
+
+
+def some_document(html):
+    soup = BeautifulSoup(html, "html.parser")
+    return build_document(soup.contents, TerminalRenderData(SOME_BASE_URL))
+
+
+def full_render(document, width):
+    buffer = io.StringIO()
+    render_document(document, OutputSink(buffer), StyleTable(), width)
+    return list(split_lines([buffer.getvalue()], width))
+
+
+def test_split_lines__full_line_then_newline__no_blank_line():
+    lines = list(split_lines(["abcd", "\n", "ef\n", "\n"], 4))
+
+    assert lines == ["abcd", "ef", ""]
+
+
+def test_split_lines__color_across_cut__reopened_on_next_line():
+    lines = list(split_lines([colored("abcdef", "red")], 4))
+
+    assert lines == ["\x1b[31mabcd", "\x1b[31mef\x1b[0m"]
+
+
+def test_split_lines__wide_characters__cut_by_columns():
+    lines = list(split_lines(["\u546a\u6587\u546a\u6587\u546a"], 4))
+
+    assert lines == ["\u546a\u6587", "\u546a\u6587", "\u546a"]
+
+
+def test_ansi_markup__colors_and_attrs__urwid_specs():
+    line = colored("a", "green", attrs=["underline"]) + "b"
+
+    markup = ansi_markup(line)
+
+    assert markup == [("dark green,underline", "a"), ("default", "b")]
+
+
+def test_virtual_document__any_access_order__same_lines_as_full_render():
+    document = some_document(some_html(300))
+    expected = full_render(document, 40)
+    view = VirtualDocument(document, 40, StyleTable(), window=32)
+
+    forward = [view.line(n) for n in range(len(expected))]
+    backward = [view.line(n) for n in reversed(range(len(expected)))]
+
+    assert forward == expected
+    assert backward == expected[::-1]
+    assert view.line(len(expected)) is None
+    assert len(view.lines) <= 2 * 32 + 64
+
+
+def test_virtual_document__link_line__points_at_link_text():
+    view = VirtualDocument(some_document(some_html(300)), 40, StyleTable(enabled=False))
+
+    line = view.link_line(250)
+
+    assert "link 249[250]" in view.line(line)
+    assert view.link_url(250) == "https://5thsrd.org/249"
+
+
+def test_virtual_document__streamed_block__checkpoints_inside_it():
+    html = f"<main>{some_html(300)}</main>"
+    expected = full_render(some_document(html), 40)
+    soup = BeautifulSoup(html, "html.parser")
+    document = StreamedDocument(soup.contents, TerminalRenderData(SOME_BASE_URL))
+    view = VirtualDocument(document, 40, StyleTable(), window=32)
+
+    first = view.line(0)
+    streamed = document.done
+    backward = [view.line(n) for n in reversed(range(len(expected)))]
+
+    assert first == expected[0]
+    assert not streamed
+    assert backward == expected[::-1]
+    assert len(view.checkpoints) > len(expected) // 64
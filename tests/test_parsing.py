@@ -0,0 +1,112 @@
+import pytest
+
+from itbrowz.parsing import (
+    BODY,
+    CONTAINER,
+    ENCODING_SNIFF_SIZE,
+    BlockScanner,
+    RootSelector,
+    parse_blocks,
+    parse_root,
+)
+
+SOME_PAGE = b"""<html><head><script>var s = "<div class='container'>";</script>
+</head><body>
+<div class="navbar"><div class="container">nav</div></div>
+<div class="container"><p>spell text<br>more</p><div class="row">row</div></div>
+<div id="footer">foot</div>
+</body></html>"""
+
+
+@pytest.mark.parametrize("parser", ["html.parser", "lxml"])
+def test_parse_root__container__strains_body_level_div(parser):
+    pytest.importorskip(parser.split(".")[0])
+
+    page = parse_root(SOME_PAGE, CONTAINER, parser)
+
+    assert page.strained
+    assert page.root.p.get_text() == "spell textmore"
+    assert page.root.find_parent("body") is None
+
+
+def test_parse_root__id_selector__strains_by_id():
+    page = parse_root(SOME_PAGE, RootSelector("div", "footer"), "html.parser")
+
+    assert page.strained
+    assert page.root.get_text() == "foot"
+
+
+def test_parse_root__selector_missing__falls_back_to_full_parse():
+    page = parse_root(SOME_PAGE, RootSelector("div", "missing"), "html.parser")
+
+    assert page.fell_back
+    assert page.root is None
+
+
+@pytest.mark.parametrize("parser", ["html.parser", "lxml"])
+@pytest.mark.parametrize("selector", [CONTAINER, BODY])
+def test_parse_blocks__byte_chunks__same_children_as_parse_root(parser, selector):
+    pytest.importorskip(parser.split(".")[0])
+    chunks = [SOME_PAGE[i : i + 1] for i in range(len(SOME_PAGE))]
+
+    blocks = list(parse_blocks(chunks, selector, parser))
+
+    expected = parse_root(SOME_PAGE, selector, parser).root.contents
+    assert len(blocks) > 1
+    assert [str(n) for b in blocks for n in b] == [str(n) for n in expected]
+
+
+def test_block_scanner__child_closed__reported_before_page_ends():
+    scanner = BlockScanner(CONTAINER)
+    head = SOME_PAGE.decode()[: SOME_PAGE.decode().index('<div class="row">')]
+
+    blocks = scanner.feed(head + '<div class="ro')
+
+    assert blocks == ["<p>spell text<br>more</p>"]
+
+
+def test_block_scanner__scanned_markup__not_kept_as_one_string():
+    scanner = BlockScanner(CONTAINER)
+    head = SOME_PAGE.decode()[: SOME_PAGE.decode().index('<div class="row">')]
+
+    scanner.feed(head + "<div>" + "<p>text</p>" * 100)
+
+    assert len(scanner.markup) < len("<p>text</p>")
+
+
+@pytest.mark.parametrize("parser", ["html.parser", "lxml"])
+def test_parse_blocks__id_selector__same_children_as_parse_root(parser):
+    pytest.importorskip(parser.split(".")[0])
+    page = SOME_PAGE.replace(b">foot<", b"><p>foot</p><p>note</p><")
+    chunks = [page[i : i + 1] for i in range(len(page))]
+    selector = RootSelector("div", "footer")
+
+    blocks = list(parse_blocks(chunks, selector, parser))
+
+    expected = parse_root(page, selector, parser).root.contents
+    assert [str(n) for b in blocks for n in b] == [str(n) for n in expected]
+
+
+def test_parse_blocks__id_before_class_match__class_match_rendered():
+    page = SOME_PAGE.replace(b'id="footer"', b'class="footer"').replace(
+        b'<div class="navbar">', b'<div id="footer"><p>by id</p></div><div>'
+    )
+    chunks = [page[i : i + 1] for i in range(len(page))]
+    selector = RootSelector("div", "footer")
+
+    blocks = list(parse_blocks(chunks, selector, "html.parser"))
+
+    assert parse_root(page, selector, "html.parser").root.get_text() == "foot"
+    assert "".join(str(n) for b in blocks for n in b) == "foot"
+
+
+def test_parse_blocks__non_ascii_after_ascii_head__same_text_as_parse_root():
+    padding = b"<p>" + b"x" * ENCODING_SNIFF_SIZE + b"</p>"
+    page = SOME_PAGE.replace(b"<p>spell", padding + "<p>café — naïve".encode())
+    chunks = [page[i : i + 512] for i in range(0, len(page), 512)]
+
+    blocks = list(parse_blocks(chunks, CONTAINER, "html.parser"))
+
+    expected = parse_root(page, CONTAINER, "html.parser").root.contents
+    assert "café — naïve" in "".join(str(n) for b in blocks for n in b)
+    assert [str(n) for b in blocks for n in b] == [str(n) for n in expected]
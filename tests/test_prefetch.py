@@ -0,0 +1,55 @@
+import time
+
+from itbrowz.prefetch import Prefetcher, rank_links
+
+SOME_PAGE = "https://5thsrd.org/spellcasting/spells/fireball/"
+
+
+def test_rank_links__same_site_first_in_page_order():
+    urls = [
+        "https://example.com/elsewhere",
+        "https://5thsrd.org/spellcasting/spells/light/",
+        SOME_PAGE + "#top",
+        "mailto:someone@example.com",
+        "https://5thsrd.org/",
+        "https://5thsrd.org/spellcasting/spells/light/#casting",
+    ]
+
+    ranked = rank_links(SOME_PAGE, urls)
+
+    assert ranked == [
+        "https://5thsrd.org/spellcasting/spells/light/",
+        "https://5thsrd.org/",
+        "https://example.com/elsewhere",
+    ]
+
+
+def test_prefetcher__top_links__loaded_once_and_handed_over():
+    def load(url):
+        return type("Page", (), {"content": b"x" * 10})(), url
+
+    prefetcher = Prefetcher(limit=2, workers=1)
+    prefetcher.start(SOME_PAGE, ["https://5thsrd.org/a", "https://5thsrd.org/b"], load)
+    prefetcher.start(SOME_PAGE, ["https://5thsrd.org/c", "https://5thsrd.org/d"], load)
+
+    first = prefetcher.take("https://5thsrd.org/c#section")
+    missing = prefetcher.take("https://5thsrd.org/a")
+    prefetcher.close()
+
+    assert first[1] == "https://5thsrd.org/c"
+    assert missing is None
+
+
+def test_prefetcher__byte_budget_spent__remaining_links_skipped():
+    def load(url):
+        time.sleep(0.01)
+        return type("Page", (), {"content": b"x" * 100})(), url
+
+    prefetcher = Prefetcher(limit=3, workers=1, byte_budget=50)
+    prefetcher.start(SOME_PAGE, [f"https://5thsrd.org/{i}" for i in range(3)], load)
+
+    results = [prefetcher.take(f"https://5thsrd.org/{i}") for i in range(3)]
+    prefetcher.close()
+
+    assert results[0] is not None
+    assert results[1:] == [None, None]
@@ -0,0 +1,50 @@
+import io
+from types import SimpleNamespace
+
+from itbrowz.fetch import Fetcher
+from itbrowz.itbrowz import FetchedPage, Target, lookup
+from itbrowz.output import OutputSink
+from itbrowz.parsing import BODY
+from itbrowz.rendered import RenderCache, RenderedPage
+
+SOME_PAGE = b'<html><body><p>cached</p><a href="/next">link</a></body></html>'
+
+
+def some_page(content=SOME_PAGE):
+    target = Target("url", "https://example.com/page")
+    return FetchedPage(target, target.name, "https://example.com", content, BODY)
+
+
+def test_render_cache__stored_page__returned_with_links(tmp_path):
+    cache = RenderCache(str(tmp_path))
+    rendered = RenderedPage("text\n1: https://example.com/next\n", ["x"])
+
+    cache.put(some_page(), 80, False, rendered)
+
+    assert cache.get(some_page(), 80, False) == rendered
+    assert cache.get(some_page(), 100, False) is None
+    assert cache.get(some_page(SOME_PAGE + b" "), 80, False) is None
+
+
+def test_lookup__unchanged_page__second_run_skips_parsing(
+    fixture_server, tmp_path, mocker
+):
+    fixture_server.pages = {"/page.html": SOME_PAGE}
+    args = SimpleNamespace(
+        url=fixture_server.url + "/page.html",
+        div="",
+        no_color=True,
+        images=False,
+        offline=False,
+        mirror=str(tmp_path / "missing.sqlite3"),
+    )
+    cache = RenderCache(str(tmp_path / "rendered"))
+    first, second = io.StringIO(), io.StringIO()
+    lookup(Target("url", args.url), args, OutputSink(first), Fetcher(), cache)
+    parse = mocker.patch("itbrowz.itbrowz.parse_target")
+
+    lookup(Target("url", args.url), args, OutputSink(second), Fetcher(), cache)
+
+    assert parse.call_count == 0
+    assert second.getvalue() == first.getvalue()
+    assert "cached" in first.getvalue()
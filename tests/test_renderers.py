@@ -1,17 +1,168 @@
+import os
+import sys
+
+import pytest
+from bs4 import BeautifulSoup  # type: ignore
 from termcolor import colored
 
-from itbrowz.renderers import render_horizontal_line
+from itbrowz import renderers
+from itbrowz.bench.corpus import fixture_pages
+from itbrowz.itbrowz import RenderFrame, TerminalRenderData
+from itbrowz.layout import Block, LineLayout, TextRun
+from itbrowz.parsing import CONTAINER, parse_root
+from itbrowz.renderers import element_renderer, recursive_element_renderer
+from itbrowz.styles import StyleTable
 
 SOME_TOTAL_TERMINAL_WIDTH = 82
 
 
-def test_render_horizontal_line__fills_all_columns(mocker):
-    render_info = mocker.Mock(
-        div_depth=0,
-        list_depth=0,
-        available_terminal_width=lambda: SOME_TOTAL_TERMINAL_WIDTH,
-    )
+def test_line_layout__rule__fills_all_columns():
+    layout = LineLayout(SOME_TOTAL_TERMINAL_WIDTH, StyleTable())
 
-    line = render_horizontal_line(render_info)
+    line = layout.rule(RenderFrame())
 
     assert line == colored("-" * SOME_TOTAL_TERMINAL_WIDTH, "cyan", attrs=[])
+
+
+def test_element_renderer__paragraph__yields_prefix_core_suffix_per_line(mocker):
+    mocker.patch("shutil.get_terminal_size", return_value=os.terminal_size((20, 24)))
+    paragraph = BeautifulSoup("<p>hello</p>", "html.parser").p
+    render_info = TerminalRenderData("https://5thsrd.org/spellcasting/spells/")
+    layout = LineLayout(render_info.base_terminal_width, render_info.styles)
+
+    fragments = layout.lay_out(element_renderer(paragraph, render_info))
+
+    assert next(fragments) == colored("", "white", attrs=[])
+    assert list(fragments) == [
+        colored("hello", "green", attrs=[]),
+        colored("", "cyan", attrs=[])
+        + colored(" " * 15, "green", attrs=[])
+        + colored("", "white", attrs=[]),
+    ]
+
+
+def test_element_renderer__div__width_independent_block():
+    div = BeautifulSoup('<div id="main"><p>hello</p></div>', "html.parser").div
+    render_info = TerminalRenderData("https://5thsrd.org/", width=40)
+
+    (block,) = element_renderer(div, render_info)
+    narrow = "".join(LineLayout(20, StyleTable(False)).lay_out([block]))
+    wide = "".join(LineLayout(40, StyleTable(False)).lay_out([block]))
+
+    assert isinstance(block, Block)
+    assert isinstance(block.children[0], TextRun)
+    assert narrow.startswith("/main" + "-" * 14 + "\\")
+    assert wide.startswith("/main" + "-" * 34 + "\\")
+
+
+def lay_out(nodes):
+    return "".join(LineLayout(80, StyleTable(False)).lay_out(nodes))
+
+
+@pytest.mark.parametrize("name", ["class", "race", "spell"])
+def test_element_renderer__fixture_page__same_as_recursive_walk(name):
+    root = parse_root(fixture_pages()[name], CONTAINER).root
+    info = TerminalRenderData("https://5thsrd.org/", width=80)
+    reference_info = TerminalRenderData("https://5thsrd.org/", width=80)
+
+    nodes = list(element_renderer(root, info))
+
+    assert lay_out(nodes) == lay_out(recursive_element_renderer(root, reference_info))
+    assert info.links.links == reference_info.links.links
+    assert len(info.frames) == 1
+
+
+def test_element_renderer__deeper_than_recursion_limit__renders():
+    depth = sys.getrecursionlimit() * 2
+    html = "<div>" * depth + "<p>bottom</p>" + "</div>" * depth
+    root = BeautifulSoup(html, "html.parser").div
+
+    output = lay_out(element_renderer(root, TerminalRenderData("https://a/", width=80)))
+
+    assert "".join(c for c in output if c.isalpha()) == "bottom"
+    assert output.count("\\") == 2 * depth
+
+
+def table_lines(html, width):
+    table = BeautifulSoup(html, "html.parser").table
+    (block,) = element_renderer(table, TerminalRenderData("https://a/", width=width))
+    return "".join(LineLayout(width, StyleTable(False)).lay_out([block])).splitlines()
+
+
+def test_element_renderer__table_fits__natural_widths():
+    html = "<table><tr><th>Level</th><th>Slots</th></tr><tr><td>1</td><td>2</td></tr>"
+
+    lines = table_lines(html + "</table>", 80)
+
+    assert lines == [
+        "+-------+-------+",
+        "| Level | Slots |",
+        "+-------+-------+",
+        "| 1     | 2     |",
+        "+-------+-------+",
+    ]
+
+
+def test_element_renderer__colspan_ragged_no_header__columns_aligned():
+    html = (
+        "<table><tr><td colspan='2'>wide cell</td><td>c</td></tr>"
+        "<tr><td>a</td></tr><tr><td>a</td><td>b</td><td>c</td></tr></table>"
+    )
+
+    lines = table_lines(html, 80)
+
+    assert lines == [
+        "+---+-------+---+",
+        "| wide cell | c |",
+        "| a |       |   |",
+        "| a | b     | c |",
+        "+---+-------+---+",
+    ]
+
+
+def test_element_renderer__table_wider_than_terminal__wrapped_to_width():
+    words = " ".join(["fireball"] * 20)
+    html = f"<table><tr><td>{words}</td><td>{words}</td><td>x</td></tr></table>"
+
+    lines = table_lines(html, 40)
+
+    assert len(lines) > 3
+    assert all(len(line) <= 40 for line in lines)
+    assert "".join(lines).count("fireball") == 40
+
+
+def test_element_renderer__sup_and_sub__translated():
+    html = "<p>mc<sup>2</sup> and H<sub>2</sub>O</p>"
+    paragraph = BeautifulSoup(html, "html.parser").p
+
+    output = lay_out(element_renderer(paragraph, TerminalRenderData("https://a/")))
+
+    assert "mc²" in output.replace(" ", "").replace("\n", "")
+    assert "H₂O" in output.replace(" ", "").replace("\n", "")
+
+
+def test_element_renderer__unknown_tag__children_rendered():
+    html = "<details><summary>Spell slots</summary><p>four</p></details>"
+    details = BeautifulSoup(html, "html.parser").details
+
+    output = lay_out(element_renderer(details, TerminalRenderData("https://a/")))
+
+    assert "Spell slots" in output and "four" in output
+
+
+def test_element_renderer__registered_renderer__overrides_builtin(mocker):
+    mocker.patch.dict(renderers.RENDERERS)
+    renderers.register("p")(renderers.render_nothing)
+    div = BeautifulSoup("<div><p>hidden</p><b>shown</b></div>", "html.parser").div
+
+    output = lay_out(element_renderer(div, TerminalRenderData("https://a/")))
+
+    assert "hidden" not in output and "shown" in output
+
+
+def test_element_renderer__strict_fallback__unknown_tag_raises(mocker):
+    mocker.patch.object(renderers, "fallback", renderers.render_unknown)
+    details = BeautifulSoup("<details>x</details>", "html.parser").details
+
+    with pytest.raises(NotImplementedError):
+        list(element_renderer(details, TerminalRenderData("https://a/")))
@@ -0,0 +1,62 @@
+import zlib
+from types import SimpleNamespace
+
+import pytest
+
+from itbrowz.itbrowz import Target, resolve_target
+from itbrowz.mirror import CrawledPage, Mirror
+from itbrowz.search import SearchIndex, build_index, index_path
+
+SOME_PAGES = {
+    ("spell", "fireball"): "A bright streak blossoms into an explosion of flame.",
+    ("spell", "magic-missile"): "Three glowing darts of magical force.",
+    ("spell", "fire-bolt"): "You hurl a mote of fire at a creature.",
+    ("race", "half-elf"): "Half-elves combine the best qualities of elves.",
+}
+
+
+@pytest.fixture()
+def index(tmp_path):
+    mirror = Mirror(str(tmp_path / "mirror.sqlite3"))
+    for (family, name), text in SOME_PAGES.items():
+        html = f'<div class="container"><p>{text}</p></div>'.encode()
+        page = CrawledPage(name, 200, None, None, "", zlib.compress(html))
+        mirror.store(family, name, page)
+    build_index(mirror, str(tmp_path / "index.sqlite3"))
+    index = SearchIndex(str(tmp_path / "index.sqlite3"))
+    yield index
+    index.close()
+
+
+def test_search_index__body_text_query__ranks_matching_page_first(index):
+    hits = index.search("darts of force")
+
+    assert hits[0][:2] == ("spell", "magic-missile")
+
+
+def test_search_index__resolve__corrects_near_miss_name(index):
+    assert index.resolve("spell", "magic_misile") == "magic-missile"
+    assert index.resolve("spell", "firebal") == "fireball"
+    assert index.resolve("race", "fireball") is None
+
+
+def test_search_index__resolve__exact_name_kept_over_closer_spelling(index):
+    assert index.resolve("spell", "fire-bolt") == "fire-bolt"
+    assert index.resolve("spell", "Fire Bolt") == "fire-bolt"
+
+
+def test_resolve_target__near_miss__says_which_page_is_shown(tmp_path, capsys):
+    mirror_path = str(tmp_path / "mirror.sqlite3")
+    mirror = Mirror(mirror_path)
+    html = zlib.compress(b'<div class="container"><p>flame</p></div>')
+    mirror.store(
+        "spell", "fireball", CrawledPage("fireball", 200, None, None, "", html)
+    )
+    build_index(mirror, index_path(mirror_path))
+    mirror.close()
+    args = SimpleNamespace(div="", mirror=mirror_path)
+
+    page = resolve_target(Target("spell", "firebal"), args)
+
+    assert page.url.endswith("/fireball")
+    assert "No spell named firebal, showing fireball" in capsys.readouterr().err
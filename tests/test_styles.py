@@ -0,0 +1,20 @@
+from termcolor import colored
+
+from itbrowz.styles import StyleTable
+
+
+def test_style_table__paint__matches_termcolor():
+    styles = StyleTable()
+
+    painted = styles.paint("text", "blue", ("underline", "reverse"))
+
+    assert painted == colored("text", "blue", attrs=["underline", "reverse"])
+
+
+def test_style_table__disabled__returns_plain_text():
+    styles = StyleTable(enabled=False)
+
+    painted = styles.paint("text", "blue", ("underline",))
+
+    assert painted == "text"
+    assert styles.styles == {}
@@ -0,0 +1,40 @@
+import pytest
+
+from itbrowz.text import display_width, superscript_translate, wrap_line, wrap_text
+
+SOME_PARAGRAPH = " ".join(["fireball"] * 30 + ["counterspell"] * 30)
+
+
+@pytest.mark.parametrize("width", [1, 7, 13, 80])
+def test_wrap_text__long_paragraph__words_kept_within_width(width):
+    lines = wrap_text(SOME_PARAGRAPH, width)
+
+    assert all(len(line) <= width for line in lines)
+    if width >= len("counterspell"):
+        assert " ".join(lines) == SOME_PARAGRAPH
+    else:
+        assert "".join(lines) == SOME_PARAGRAPH.replace(" ", "")
+
+
+def test_wrap_text__tabs_and_blank_lines__normalized():
+    lines = wrap_text("\n\nCasting Time:\r\n\t1 action\n\n", 80)
+
+    assert lines == ["Casting Time:", " 1 action"]
+
+
+def test_wrap_line__wide_characters__measured_in_columns():
+    line = "呪文 " * 10 + "épée"
+
+    lines = wrap_line(line, 9)
+
+    assert display_width("呪文") == 4
+    assert display_width("é") == 1
+    assert lines == ["呪文 呪文"] * 5 + ["épée"]
+
+
+def test_wrap_line__wide_character_wider_than_line__one_per_line():
+    assert wrap_line("呪文", 1) == ["呪", "文"]
+
+
+def test_superscript_translate__unmapped_characters__kept():
+    assert superscript_translate("x2+1!") == "ˣ²⁺¹!"